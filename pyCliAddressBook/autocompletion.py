@@ -5,29 +5,57 @@ First time need to enter command from terminal:
 pip install prompt_toolkit
 """
 
-from datetime import datetime
-from prompt_toolkit import prompt
-from prompt_toolkit.completion import WordCompleter
-from prompt_toolkit.key_binding import KeyBindings
-from prompt_toolkit.validation import Validator
+from datetime import datetime, timedelta
 from abc import ABC, abstractmethod
 
-import pyCliAddressBook.sorting as sorting
-# import sorting as sorting
+from pyCliAddressBook.metrics import metrics
+from pyCliAddressBook.pager import view_pages
 
-kb = KeyBindings()
+# prompt_toolkit is slow to import, so it is imported by the first prompt
+prompt_options = None
 
 
-@kb.add("c-space")
-def _(event):
+def key_bindings():
+    from prompt_toolkit.key_binding import KeyBindings
 
-    # Start auto completion. If the menu is showing already, select the next completion
-    b = event.app.current_buffer
+    kb = KeyBindings()
 
-    if b.complete_state:
-        b.complete_next()
-    else:
-        b.start_completion(select_first=False)
+    @kb.add("c-space")
+    def _(event):
+
+        # Start auto completion. If the menu is showing already, select the next completion
+        b = event.app.current_buffer
+
+        if b.complete_state:
+            b.complete_next()
+        else:
+            b.start_completion(select_first=False)
+
+    return kb
+
+
+def get_prompt_options() -> dict:
+    """
+    Creating completer, validator & key bindings of the prompt once
+    :return: dict
+        keyword arguments of prompt
+    """
+    global prompt_options
+    if prompt_options is None:
+        from prompt_toolkit.completion import WordCompleter
+        from prompt_toolkit.validation import Validator
+
+        cmd = WordCompleter(
+            command_name_list,
+            ignore_case=True,
+        )
+        validator = Validator.from_callable(
+            is_in_command_name_list,
+            error_message='Invalid choice.',
+            move_cursor_to_end=True)
+        prompt_options = {'completer': cmd, 'validator': validator,
+                          'complete_while_typing': True, 'key_bindings': key_bindings()}
+    return prompt_options
 
 
 def autocomplete():
@@ -36,16 +64,23 @@ def autocomplete():
     :return: str
         inputted command
     """
-    text: str = prompt("Type cmd: ", completer=cmd, validator=validator,
-                       complete_while_typing=True, key_bindings=kb)
+    from prompt_toolkit import prompt
+
+    text: str = prompt("Type cmd: ", **get_prompt_options())
     return text
 
 
 class Command(ABC):
+    # name of the command in command_list, set by Invoker
+    name = None
+
     @abstractmethod
     def execute(self) -> bool:
         pass
 
+    def print_page(self, records: list, start: int) -> None:
+        self.subject.print_in_table(records, "#", start)
+
 
 class Command_add(Command):
 
@@ -66,7 +101,7 @@ class Command_view_all(Command):
     def execute(self) -> bool:
 
         if self.subject.data:
-            self.subject.print_in_table(self.subject.data.values(), "#")
+            view_pages(self.subject.data.values(), self.print_page)
         else:
             print("No match records in database")
 
@@ -83,7 +118,24 @@ class Command_search(Command):
         records = self.subject.get_records_dy_key()
 
         if records:
-            self.subject.print_in_table(records, "#")
+            view_pages(records, self.print_page)
+        else:
+            print("No match records in database")
+
+        return True
+
+
+class Command_search_fuzzy(Command):
+
+    def __init__(self, subject):
+        self.subject = subject
+
+    def execute(self) -> bool:
+
+        records = self.subject.get_similar_records()
+
+        if records:
+            view_pages(records, self.print_page)
         else:
             print("No match records in database")
 
@@ -100,7 +152,7 @@ class Command_find(Command):
         records = self.subject.find_records()
 
         if records:
-            self.subject.print_in_table(records, "#")
+            view_pages(records, self.print_page)
         else:
             print("No match records in database")
 
@@ -114,29 +166,29 @@ class Command_sort_birthday(Command):
 
     def execute(self) -> bool:
 
-        gap_days = int(input("Enter timedelta for birthday: "))
+        gap_days = int(metrics.input("Enter timedelta for birthday: "))
         current_date = datetime.now()
+        today = current_date.date()
         result = {}
 
-        for name in self.subject.data:
-            bday = self.subject.data[name]["birthday"]
-            try:
-                mappedbday = bday.replace(year=current_date.year)
-            except ValueError:
-                # 29 February cannot be mapped to non-leap year. Choose 28-Feb instead
-                mappedbday = bday.replace(year=current_date.year, day=28)
-
-            if 0 <= (mappedbday - current_date).days < gap_days:
-                try:
-                    result[mappedbday.strftime('%A')].append(name)
-                except KeyError:
-                    result[mappedbday.strftime('%A')] = [name]
-            elif current_date.weekday() == 0:
-                if -2 <= (mappedbday - current_date).days < 0:
-                    try:
-                        result[current_date.strftime('%A')].append(name)
-                    except KeyError:
-                        result[current_date.strftime('%A')] = [name]
+        # every birthday is reminded once: the period is shorter than a year
+        try:
+            next_year = today.replace(year=today.year + 1)
+        except ValueError:
+            next_year = today.replace(year=today.year + 1, month=3, day=1)
+        last_day = min(today + timedelta(days=gap_days), next_year - timedelta(days=1))
+
+        upcoming = self.subject.birthdays_between(today + timedelta(days=1), last_day)
+        upcoming_names = {name for _, name in upcoming}
+
+        if current_date.weekday() == 0:
+            # on Monday yesterday's and today's birthdays are reminded too
+            for _, name in self.subject.birthdays_between(today - timedelta(days=1), today):
+                if name not in upcoming_names:
+                    result.setdefault(current_date.strftime('%A'), []).append(name)
+
+        for bday, name in upcoming:
+            result.setdefault(bday.strftime('%A'), []).append(name)
 
         for day, names in result.items():
             print(f"Start reminder on {day}: {', '.join(names)}")
@@ -187,7 +239,7 @@ class Command_reset(Command):
 
     def execute(self) -> bool:
 
-        self.subject.data = {}
+        self.subject.reset_records()
 
         return True
 
@@ -195,10 +247,31 @@ class Command_reset(Command):
 class Command_file_sort(Command):
 
     def execute(self) -> bool:
+        import pyCliAddressBook.sorting as sorting
+
         sorting.perform()
         return True
 
 
+class Command_stats(Command):
+
+    def execute(self) -> bool:
+
+        snapshot = metrics.snapshot()
+        counters = snapshot['counters']
+        print(f"{'operation':<20} {'calls':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'max ms':>9} {'scanned':>9} {'returned':>9}")
+        for name, latency in snapshot['latency'].items():
+            print(f"{name:<20} {latency['count']:>7} {latency['mean_ms']:>9} {latency['p50_ms']:>9} "
+                  f"{latency['p95_ms']:>9} {latency['p99_ms']:>9} {latency['max_ms']:>9} "
+                  f"{counters.get(f'{name}.scanned', ''):>9} {counters.get(f'{name}.returned', ''):>9}")
+        for name, value in counters.items():
+            if name.startswith('storage.'):
+                print(f"{name}: {value}")
+
+        return True
+
+
 class Command_exit(Command):
 
     def execute(self) -> bool:
@@ -231,15 +304,18 @@ command_list = [{'command_name': 'add',
                 {'command_name': 'search',
                  'command_cls': Command_search, 'subject': 'addressBook',
                  'help': 'Searching record in address book by name and printing found record as a formatted table'},
+                {'command_name': 'search_fuzzy',
+                 'command_cls': Command_search_fuzzy, 'subject': 'addressBook',
+                 'help': 'Searching contacts by name with typos and printing the closest ones as a formatted table'},
                 {'command_name': 'search_notes',
                  'command_cls': Command_search, 'subject': 'noteBook',
-                 'help': 'Searching note keyword and printing found notes as a formatted table'},
+                 'help': 'Searching notes by keywords and printing found notes as a formatted table.\nUse tag* to search by beginning of keyword, tag & tag for all keywords, tag | tag for any of them'},
                 {'command_name': 'find',
                  'command_cls': Command_find, 'subject': 'addressBook',
                  'help': 'Searching contact in address book by any field and printing found contacts as a formatted table'},
                 {'command_name': 'find_notes',
                  'command_cls': Command_find, 'subject': 'noteBook',
-                 'help': 'Searching notes in note book by any words'},
+                 'help': 'Searching notes in note book by any words, the best matches first.\nUse "quoted words" to search a phrase'},
                 {'command_name': 'sort_birthday',
                  'command_cls': Command_sort_birthday, 'subject': 'addressBook',
                  'help': 'Printing contacts which have birthday in defined period'},
@@ -264,6 +340,9 @@ command_list = [{'command_name': 'add',
                 {'command_name': 'file_sort',
                  'command_cls': Command_file_sort,
                  'help': 'Sorting files to categorical folders. Normalising names of files & folders.\nRemoting empty folders. Unpacking archives.'},
+                {'command_name': 'stats',
+                 'command_cls': Command_stats,
+                 'help': 'Printing latencies of commands & storage, records scanned & returned by searches, bytes read & written'},
                 {'command_name': 'exit',
                  'command_cls': Command_exit,
                  'help': 'Exit'},
@@ -273,22 +352,11 @@ command_list = [{'command_name': 'add',
 
 command_name_list = [command['command_name'] for command in command_list]
 
-cmd = WordCompleter(
-    command_name_list,
-    ignore_case=True,
-)
-
 
 def is_in_command_name_list(text):
     return text.lower() in command_name_list
 
 
-validator = Validator.from_callable(
-    is_in_command_name_list,
-    error_message='Invalid choice.',
-    move_cursor_to_end=True)
-
-
 class Invoker():
     def __init__(self, app) -> None:
         self.commands = {}
@@ -299,11 +367,20 @@ class Invoker():
             else:
                 self.commands[command['command_name']
                               ] = command['command_cls']()
+            self.commands[command['command_name']].name = command['command_name']
 
     def choose_command(self) -> Command:
         choice = autocomplete().lower()
         return self.commands.get(choice)
 
+    def execute(self, command: Command) -> bool:
+        """
+        Performing the command, its latency is recorded and it's profiled by --profile
+        :return: bool
+            False if the application must exit
+        """
+        return metrics.call(command.name, command.execute)
+
 
 if __name__ == "__main__":
     autocomplete()
@@ -0,0 +1,252 @@
+"""
+Performing commands without prompts.
+Commands are read from a file or stdin as JSON objects, one per line,
+named like commands of the prompt, with their fields as arguments:
+    {"id": 1, "command": "add", "name": "John", "phone": "0501234567", "region": "UA"}
+    {"id": 2, "command": "find_notes", "query": "meeting", "k": 5}
+Every command gets one line of JSON result, id is copied from the command:
+    {"id": 1, "ok": true, "result": {"name": "John", ...}}
+    {"id": 2, "ok": false, "error": "Missing query"}
+Entered data are checked by the rules of the import. Changes of every batch
+of lines are one write of the storage. Nothing is rendered by rich and
+prompt_toolkit isn't imported.
+"""
+
+import json
+import sys
+from datetime import date, timedelta
+from itertools import islice
+
+import pyCliAddressBook.importer as importer
+from pyCliAddressBook.metrics import metrics
+
+
+# lines performed by one write of the storage
+BATCH_SIZE = 1000
+
+
+class CommandError(Exception):
+    """
+    Command can't be performed, the message is the error of its result
+    """
+
+
+def argument(request: dict, name: str, default=None, kind: type = str):
+    """
+    Argument of the command
+    :raise CommandError: the argument is required, but it's missing, empty or not of the kind
+    """
+    value = request.get(name, default)
+    if value is None or value == '':
+        raise CommandError(f"Missing {name}")
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise CommandError(f"{name} must be {'a string' if kind is str else 'a number'}")
+    return value
+
+
+def person_json(person) -> dict:
+    return {'name': person.name, 'address': person.address, 'phone': person.phone,
+            'email': person.email, 'birthday': date.fromordinal(person._birthday).isoformat()}
+
+
+def note_json(note) -> dict:
+    return {'date': note.date, 'note': note.value, 'keywords': list(note.keyWords)}
+
+
+def checked(row: dict) -> tuple:
+    """
+    Fields of the contact or the note checked like imported ones, phones are normalized for row['region']
+    :raise CommandError: fields are invalid
+    """
+    _, kind, fields = importer.validate([(None, row)])[0]
+    if kind is None:
+        raise CommandError(fields)
+    return fields
+
+
+def add(app, request: dict):
+    name, address, phone, email, birthday = checked({field: request.get(field) for field in
+                                                     (*importer.PERSON_FIELDS, 'region')})
+    if not app.addressBook.add_person(name, address, phone, email, birthday):
+        raise CommandError("Contact already present")
+    return person_json(app.addressBook.data[name])
+
+
+def add_notes(app, request: dict):
+    value, keywords, note_date = checked({'note': argument(request, 'note'), 'keywords': request.get('keywords'),
+                                          'date': request.get('date')})
+    return note_json(app.noteBook.data[app.noteBook.add_note(value, keywords, note_date)])
+
+
+def view_all(app, request: dict):
+    records = islice(app.addressBook.data.values(), request.get('offset', 0), request.get('limit'))
+    return [person_json(person) for person in records]
+
+
+def view_all_notes(app, request: dict):
+    records = islice(app.noteBook.data.values(), request.get('offset', 0), request.get('limit'))
+    return [note_json(note) for note in records]
+
+
+def search(app, request: dict):
+    person = app.addressBook.data.get(argument(request, 'name'))
+    return [person_json(person)] if person else []
+
+
+def search_fuzzy(app, request: dict):
+    persons = app.addressBook.search_fuzzy(argument(request, 'name'), request.get('k', 10),
+                                           request.get('max_distance'))
+    return [person_json(person) for person in persons]
+
+
+def search_notes(app, request: dict):
+    notes = app.noteBook.data
+    return [note_json(notes[key]) for key in app.noteBook.search_tags(argument(request, 'query'))]
+
+
+def find(app, request: dict):
+    return [person_json(person) for person in app.addressBook.find_persons(argument(request, 'query'))]
+
+
+def find_notes(app, request: dict):
+    return [note_json(note) for note in app.noteBook.search_text(argument(request, 'query'), request.get('k', 10))]
+
+
+def sort_birthday(app, request: dict):
+    today = date.today()
+    birthdays = app.addressBook.birthdays_between(today + timedelta(days=1),
+                                                  today + timedelta(days=argument(request, 'days', kind=int)))
+    return [{'date': day.isoformat(), 'name': name} for day, name in birthdays]
+
+
+def update(app, request: dict):
+    key = argument(request, 'name')
+    if key not in app.addressBook.data:
+        raise CommandError("Records not found")
+    row = {field: request.get(field) for field in (*importer.PERSON_FIELDS, 'region')}
+    # the new name is checked only when it's given, as other fields are
+    row['name'] = request.get('new_name') or key
+    name, address, phone, email, birthday = checked(row)
+    if not app.addressBook.update_person(key, name, address, phone, email, birthday):
+        raise CommandError("Contact already present")
+    return person_json(app.addressBook.data[name])
+
+
+def update_notes(app, request: dict):
+    note_date = argument(request, 'date')
+    note = app.noteBook.data.get(note_date)
+    if note is None:
+        raise CommandError("Records not found")
+    value, keywords, _ = checked({'note': request.get('note') or note.value, 'keywords': request.get('keywords')})
+    app.noteBook.update_note(note_date, value, keywords)
+    return note_json(note)
+
+
+def delete(app, request: dict):
+    if not app.addressBook.delete_person(argument(request, 'name')):
+        raise CommandError("Records not found")
+    return None
+
+
+def delete_notes(app, request: dict):
+    if not app.noteBook.delete_note(argument(request, 'date')):
+        raise CommandError("Records not found")
+    return None
+
+
+def reset(app, request: dict):
+    app.addressBook.reset_records()
+    return None
+
+
+def reset_notes(app, request: dict):
+    app.noteBook.reset_records()
+    return None
+
+
+def stats(app, request: dict):
+    return metrics.snapshot()
+
+
+COMMANDS = {function.__name__: function for function in (
+    add, add_notes, view_all, view_all_notes, search, search_fuzzy, search_notes, find, find_notes,
+    sort_birthday, update, update_notes, delete, delete_notes, reset, reset_notes, stats)}
+# commands changing the books
+CHANGING = frozenset({'add', 'add_notes', 'update', 'update_notes', 'delete', 'delete_notes', 'reset', 'reset_notes'})
+
+
+def perform(app, request) -> dict:
+    """
+    Performing one command
+    :param app: Application
+    :param request: dict
+        command with its arguments
+    :return: dict
+        result of the command
+    """
+    if not isinstance(request, dict):
+        return {'id': None, 'ok': False, 'error': "Command must be a JSON object"}
+    response = {'id': request.get('id')}
+    function = COMMANDS.get(request.get('command'))
+    if function is None:
+        response.update(ok=False, error=f"Unknown command {request.get('command')!r}")
+        return response
+    try:
+        response.update(ok=True, result=metrics.call(f'batch.{function.__name__}', function, app, request,
+                                                     profile=False))
+    except CommandError as error:
+        response.update(ok=False, error=str(error))
+    except (TypeError, ValueError, OverflowError) as error:
+        response.update(ok=False, error=f"Invalid arguments: {error}")
+    except Exception as error:
+        # one bad command doesn't stop the others
+        response.update(ok=False, error=f"Command failed: {error!r}")
+    return response
+
+
+def perform_lines(app, lines, output=None, batch_size: int = BATCH_SIZE) -> tuple:
+    """
+    Performing commands, one JSON object per line
+    :param app: Application
+    :param lines: iterable
+        lines of commands, empty lines are skipped
+    :param output: file
+        results are written to, stdout by default
+    :param batch_size: int
+        lines performed by one write of the storage
+    :return: tuple
+        numbers of performed and failed commands
+    """
+    output = output or sys.stdout
+    performed = failed = 0
+    lines = iter(lines)
+    while batch := list(islice(lines, batch_size)):
+        results = []
+        with app.storage.batch():
+            for line in batch:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    result = {'id': None, 'ok': False, 'error': f"Invalid JSON: {error}"}
+                else:
+                    result = perform(app, request)
+                performed += 1
+                failed += not result['ok']
+                results.append(json.dumps(result, ensure_ascii=False))
+        output.write('\n'.join(results) + '\n' if results else '')
+        output.flush()
+    return performed, failed
+
+
+def perform_file(app, path: str = '-', batch_size: int = BATCH_SIZE) -> tuple:
+    """
+    Performing commands of the file, stdin if path is '-' or empty
+    :return: tuple
+        numbers of performed and failed commands
+    """
+    if not path or path == '-':
+        return perform_lines(app, sys.stdin, batch_size=batch_size)
+    with open(path, encoding='utf-8') as file:
+        return perform_lines(app, file, batch_size=batch_size)
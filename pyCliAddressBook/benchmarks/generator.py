@@ -0,0 +1,287 @@
+"""
+Synthetic data for benchmarks.
+Contacts have names of letters only, like the validator wants, E.164 phones,
+emails made of names and birthdays from 1940 to 2010. Notes have texts
+of common words and tags of a skewed distribution, a few tags are in most
+notes. File trees for sorting have nested folders with Cyrillic names,
+files of every category, unknown files, archives and duplicates.
+The same seed gives the same data.
+
+python -m pyCliAddressBook.benchmarks.generator book contacts.data --persons 100000 --notes 10000
+python -m pyCliAddressBook.benchmarks.generator tree inbox --files 1000
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import tarfile
+import zipfile
+from datetime import date, datetime, timedelta
+
+
+FIRST_NAMES = (
+    'Olena', 'Oksana', 'Iryna', 'Natalia', 'Tetiana', 'Yulia', 'Anna', 'Maria', 'Kateryna', 'Sofia',
+    'Viktoria', 'Daria', 'Halyna', 'Larysa', 'Svitlana', 'Nadia', 'Lesia', 'Khrystyna', 'Zoriana', 'Marta',
+    'Andrii', 'Oleksandr', 'Dmytro', 'Serhii', 'Yurii', 'Valerii', 'Mykola', 'Volodymyr', 'Taras', 'Bohdan',
+    'Ivan', 'Petro', 'Vasyl', 'Maksym', 'Artem', 'Denys', 'Roman', 'Ihor', 'Pavlo', 'Oleh',
+    'John', 'Mary', 'James', 'Linda', 'Robert', 'Susan', 'Michael', 'Karen', 'David', 'Emma',
+    'William', 'Olivia', 'Thomas', 'Sophie', 'George', 'Grace', 'Henry', 'Alice', 'Jacob', 'Chloe',
+    'Piotr', 'Agnieszka', 'Krzysztof', 'Magdalena', 'Tomasz', 'Joanna', 'Pawel', 'Ewa', 'Marek', 'Zofia',
+    'Lukas', 'Hanna', 'Jonas', 'Lea', 'Felix', 'Mia', 'Noah', 'Lena', 'Elias', 'Clara')
+SURNAME_STARTS = (
+    'Kova', 'Shev', 'Bond', 'Tkach', 'Kravch', 'Oliy', 'Mykh', 'Polish', 'Lysen', 'Mel',
+    'Bo', 'Mar', 'Sav', 'Ru', 'Hon', 'Pet', 'Kly', 'Sydor', 'Lev', 'Skit',
+    'Hryh', 'Dan', 'Zah', 'Kuz', 'Fed', 'Pav', 'Tym', 'Sem', 'Mos', 'Yar',
+    'Smi', 'John', 'Wil', 'Brow', 'Tay', 'And', 'Tho', 'Whi', 'Har', 'Clar')
+SURNAME_MIDDLES = (
+    '', 'al', 'ar', 'en', 'er', 'ov', 'ol', 'ad', 'ut', 'an',
+    'ys', 'ur', 'im', 'ov', 'es', 'ch', 'sh', 'ry', 'lo', 'ta',
+    'ka', 'no', 'ni', 'de', 'ro')
+SURNAME_ENDS = (
+    'enko', 'chuk', 'uk', 'yak', 'ko', 'ych', 'ovych', 'sky', 'ska', 'ets',
+    'ak', 'son', 'ton', 'ley', 'man', 'er', 'ski', 'cz', 'iv', 'a')
+CITIES = ('Kyiv', 'Lviv', 'Kharkiv', 'Odesa', 'Dnipro', 'Vinnytsia', 'Poltava', 'Chernihiv', 'Uzhhorod',
+          'London', 'Manchester', 'Warsaw', 'Krakow', 'Berlin', 'Toronto', 'New York')
+STREETS = ('Shevchenka', 'Franka', 'Khreshchatyk', 'Sadova', 'Zelena', 'Lesi Ukrainky', 'Hrushevskoho',
+           'High Street', 'Station Road', 'Marszalkowska', 'Main Street', 'Park Avenue')
+DOMAINS = ('gmail.com', 'ukr.net', 'i.ua', 'outlook.com', 'yahoo.com', 'proton.me', 'wp.pl', 'mail.com')
+# country code, national number length, leading digits of mobile numbers
+PHONE_PLANS = (('380', 9, ('50', '63', '66', '67', '68', '73', '93', '95', '96', '97', '98', '99')),
+               ('44', 10, ('74', '75', '77', '78', '79')),
+               ('48', 9, ('50', '51', '53', '57', '60', '66', '69', '72', '78', '79', '88')),
+               ('1', 10, ('202', '212', '305', '415', '416', '617', '646', '718')))
+PHONE_WEIGHTS = (70, 10, 10, 10)
+WORDS = (
+    'meeting', 'call', 'project', 'report', 'deadline', 'client', 'invoice', 'review', 'plan', 'budget',
+    'buy', 'milk', 'bread', 'gift', 'birthday', 'doctor', 'dentist', 'school', 'lesson', 'homework',
+    'flight', 'hotel', 'ticket', 'train', 'visa', 'passport', 'car', 'repair', 'insurance', 'bank',
+    'python', 'release', 'bug', 'deploy', 'server', 'database', 'backup', 'migration', 'test', 'design',
+    'book', 'movie', 'concert', 'museum', 'garden', 'recipe', 'dinner', 'lunch', 'coffee', 'tea',
+    'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'weekend', 'morning', 'evening', 'tomorrow', 'today',
+    'remember', 'check', 'send', 'write', 'read', 'pay', 'order', 'cancel', 'visit', 'ask',
+    'mom', 'dad', 'sister', 'brother', 'friend', 'team', 'boss', 'neighbour', 'teacher', 'kids')
+TAGS = ('work', 'home', 'todo', 'idea', 'shopping', 'family', 'travel', 'health', 'finance', 'study',
+        'urgent', 'later', 'books', 'movies', 'music', 'sport', 'car', 'garden', 'cooking', 'friends',
+        'python', 'release', 'meeting', 'calls', 'gifts', 'birthdays', 'bills', 'documents', 'repair', 'pets')
+# tags are chosen with weights 1/rank, so a few tags are in most notes
+TAG_WEIGHTS = tuple(1 / rank for rank in range(1, len(TAGS) + 1))
+
+# folders of a tree for sorting, Cyrillic & spaces are normalized by sorting
+FOLDER_NAMES = ('Завантаження', 'Фото з відпустки', 'docs', 'Музика', 'old stuff', 'Відео 2022',
+                'проєкт', 'misc', 'Нова папка', 'backup copy', 'Робочий стіл', 'scans')
+FILE_NAMES = ('звіт', 'IMG_', 'фото', 'report', 'Документ', 'track', 'відео', 'scan', 'Копія', 'invoice',
+              'Резюме', 'draft', 'song', 'clip', 'notes')
+UNKNOWN_EXTENSIONS = ('.exe', '.py', '.iso', '.json', '.bak', '')
+# share of files: archives, unknown files, duplicates of another file
+ARCHIVE_SHARE = 0.01
+UNKNOWN_SHARE = 0.05
+DUPLICATE_SHARE = 0.05
+
+
+def person_fields(count: int, seed: int = 0):
+    """
+    Fields of synthetic contacts with unique names
+    :return: generator
+        (name, address, phone, email, birthday as yyyy-mm-dd) tuples
+    """
+    rnd = random.Random(seed)
+    names = set()
+    emails = {}
+    first_birthday = date(1940, 1, 1).toordinal()
+    last_birthday = date(2010, 12, 31).toordinal()
+    for _ in range(count):
+        while True:
+            first = rnd.choice(FIRST_NAMES)
+            surname = (rnd.choice(SURNAME_STARTS) + rnd.choice(SURNAME_MIDDLES) +
+                       rnd.choice(SURNAME_MIDDLES) + rnd.choice(SURNAME_ENDS))
+            name = first + surname.lower()
+            if name not in names:
+                names.add(name)
+                break
+
+        address = f'{rnd.choice(CITIES)}, {rnd.choice(STREETS)} {rnd.randint(1, 200)}'
+        code, length, prefixes = rnd.choices(PHONE_PLANS, PHONE_WEIGHTS)[0]
+        prefix = rnd.choice(prefixes)
+        phone = f'+{code}{prefix}{rnd.randrange(10 ** (length - len(prefix))):0{length - len(prefix)}d}'
+        login = f'{first}.{surname}'.lower()
+        # the same login on the same domain gets a number
+        email_key = (login, rnd.choice(DOMAINS))
+        taken = emails.get(email_key, 0)
+        emails[email_key] = taken + 1
+        email = f'{login}{taken or ""}@{email_key[1]}'
+        birthday = date.fromordinal(rnd.randint(first_birthday, last_birthday)).isoformat()
+        yield name, address, phone, email, birthday
+
+
+def note_fields(count: int, seed: int = 0):
+    """
+    Fields of synthetic notes, dated by growing times
+    :return: generator
+        (text, tags, ISO date) tuples
+    """
+    rnd = random.Random(seed)
+    moment = datetime(2020, 1, 1, 8, 0)
+    for _ in range(count):
+        moment += timedelta(seconds=rnd.randint(1, 3600))
+        tags = list(dict.fromkeys(rnd.choices(TAGS, TAG_WEIGHTS, k=rnd.randint(1, 3))))
+        words = rnd.choices(WORDS, k=rnd.randint(3, 25))
+        text = ' '.join(words + [f'#{tag}#' for tag in tags])
+        yield text, tags, moment.isoformat()
+
+
+def make_persons(count: int, seed: int = 0) -> dict:
+    """
+    Synthetic contacts
+    :return: dict
+        {name: Person}
+    """
+    from pyCliAddressBook.main import Person
+
+    return {fields[0]: Person(*fields) for fields in person_fields(count, seed)}
+
+
+def make_notes(count: int, seed: int = 0) -> dict:
+    """
+    Synthetic notes
+    :return: dict
+        {date: Note}
+    """
+    from pyCliAddressBook.main import Note
+
+    notes = {}
+    for text, tags, moment in note_fields(count, seed):
+        note = Note(text, tags)
+        note.date = moment
+        notes[moment] = note
+    return notes
+
+
+def make_book(database: str, persons: int, notes: int = 0, seed: int = 0, engine: str = 'journal') -> None:
+    """
+    Writing database of synthetic contacts & notes
+    :param database: str
+        path to the database
+    :param persons: int
+        number of contacts
+    :param notes: int
+        number of notes
+    :param seed: int
+    :param engine: str
+        storage the database is made for: 'journal', 'pickle' or 'sqlite'
+    """
+    from pyCliAddressBook.storage import SQLiteStorage, write_mapped, write_snapshot
+
+    dict_application = {'persons': make_persons(persons, seed), 'notes': make_notes(notes, seed)}
+    if engine == 'pickle':
+        write_snapshot(database, dict_application)
+        return
+    write_mapped(database, dict_application)
+    if engine == 'sqlite':
+        # the SQLite database is migrated from the snapshot by its first load
+        storage = SQLiteStorage(database)
+        storage.close(storage.load())
+
+
+def archive_bytes(kind: str, rnd: random.Random) -> bytes:
+    """
+    Small archive of a few text files
+    """
+    buffer = io.BytesIO()
+    members = [(f'{rnd.choice(FILE_NAMES)}{number}.txt', rnd.randbytes(rnd.randint(16, 512)))
+               for number in range(rnd.randint(1, 4))]
+    if kind == '.zip':
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for name, data in members:
+                archive.writestr(name, data)
+    else:
+        with tarfile.open(fileobj=buffer, mode='w:gz' if kind == '.gz' else 'w') as archive:
+            for name, data in members:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def make_tree(root: str, files: int, seed: int = 0, depth: int = 3, max_size: int = 4096) -> None:
+    """
+    Writing a folder to sort
+    :param root: str
+        folder of the tree, created if it's missing
+    :param files: int
+        number of files
+    :param seed: int
+    :param depth: int
+        nesting of folders
+    :param max_size: int
+        bytes of the biggest file
+    """
+    from pyCliAddressBook.sorting import files_extension_to_folders
+
+    rnd = random.Random(seed)
+    extensions = [extension for folder, folder_extensions in files_extension_to_folders.items()
+                  if folder != 'archives' for extension in folder_extensions]
+    archive_extensions = files_extension_to_folders['archives']
+
+    # about 50 files per folder
+    folders = [root]
+    parents = [(root, 0)]
+    for number in range(max(1, files // 50)):
+        parent, level = rnd.choice(parents)
+        folder = os.path.join(parent, f'{rnd.choice(FOLDER_NAMES)} {number}')
+        folders.append(folder)
+        if level + 1 < depth:
+            parents.append((folder, level + 1))
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+    # a few empty folders are removed by sorting
+    for number in range(max(1, files // 500)):
+        os.makedirs(os.path.join(rnd.choice(folders), f'{rnd.choice(FOLDER_NAMES)} empty {number}'), exist_ok=True)
+
+    contents = []
+    for number in range(files):
+        share = rnd.random()
+        if share < ARCHIVE_SHARE:
+            extension = rnd.choice(archive_extensions)
+            data = archive_bytes(extension, rnd)
+        else:
+            extension = (rnd.choice(UNKNOWN_EXTENSIONS) if share < ARCHIVE_SHARE + UNKNOWN_SHARE
+                         else rnd.choice(extensions))
+            if contents and rnd.random() < DUPLICATE_SHARE:
+                data = rnd.choice(contents)
+            else:
+                data = rnd.randbytes(rnd.randint(0, max_size))
+                if len(contents) < 1000:
+                    contents.append(data)
+        path = os.path.join(rnd.choice(folders), f'{rnd.choice(FILE_NAMES)}{number}{extension}')
+        with open(path, 'wb') as file:
+            file.write(data)
+
+
+def main(argv: list = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Synthetic data for benchmarks')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    book_parser = commands.add_parser('book', help='database of synthetic contacts & notes')
+    book_parser.add_argument('database')
+    book_parser.add_argument('--persons', type=int, default=1000)
+    book_parser.add_argument('--notes', type=int, default=0)
+    book_parser.add_argument('--engine', choices=('journal', 'pickle', 'sqlite'), default='journal')
+    book_parser.add_argument('--seed', type=int, default=0)
+
+    tree_parser = commands.add_parser('tree', help='folder of files to sort')
+    tree_parser.add_argument('folder')
+    tree_parser.add_argument('--files', type=int, default=1000)
+    tree_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'book':
+        make_book(args.database, args.persons, args.notes, args.seed, args.engine)
+    else:
+        make_tree(args.folder, args.files, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Startup time of the assistant command.
+Every run starts a fresh interpreter, which imports the package,
+opens the database and prepares the first prompt.
+
+python -m pyCliAddressBook.benchmarks.startup --book-size 200000 --budget 100
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from pyCliAddressBook.benchmarks.generator import make_book
+
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# runs in the fresh interpreter, times are printed as JSON
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from pyCliAddressBook.main import open_application
+from pyCliAddressBook.autocompletion import Invoker, get_prompt_options
+imported = time.perf_counter()
+app = open_application(sys.argv[1])
+invoker = Invoker(app)
+str(app)
+opened = time.perf_counter()
+import prompt_toolkit.shortcuts
+get_prompt_options()
+prompted = time.perf_counter()
+app.close()
+print(json.dumps({'import': imported - start, 'open': opened - imported, 'prompt': prompted - opened}))
+"""
+
+
+def measure(database: str, runs: int) -> dict:
+    """
+    Timing startup in fresh interpreters
+    :return: dict
+        median milliseconds of every phase and of the whole process
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PACKAGE_ROOT, os.environ.get('PYTHONPATH')])))
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', PROBE, database], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        phases = json.loads(output.splitlines()[-1])
+        phases['process'] = time.perf_counter() - start
+        samples.append(phases)
+
+    return {phase: round(statistics.median(sample[phase] for sample in samples) * 1000, 2)
+            for phase in samples[0]}
+
+
+def main(argv: list = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Startup time of the assistant command')
+    arg_parser.add_argument('--book-size', type=int, default=0, help='synthetic contacts in the database')
+    arg_parser.add_argument('--database', help='existing database instead of a synthetic one')
+    arg_parser.add_argument('--runs', type=int, default=10)
+    arg_parser.add_argument('--budget', type=float,
+                            help='milliseconds allowed for the process to be ready for the first command')
+    args = arg_parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as folder:
+        database = args.database or os.path.join(folder, 'contacts.data')
+        if not args.database:
+            make_book(database, args.book_size)
+        result = measure(os.path.abspath(database), args.runs)
+
+    # ready for the first command: interpreter, imports and the database, without prompt_toolkit
+    result['ready'] = round(result['process'] - result['prompt'], 2)
+    print(json.dumps(result, indent=2))
+    if args.budget is not None and result['ready'] > args.budget:
+        print(f"Startup {result['ready']} ms is over the budget {args.budget} ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,508 @@
+"""
+Benchmarks of the address book, the note book and sorting of files.
+Every benchmark runs on synthetic data of the generator at 1k, 100k or 1M
+contacts (and a note per ten contacts), the same seed gives the same data.
+A benchmark is repeated and its median is kept, results are written as JSON.
+Comparing with a baseline flags benchmarks which became slower than the
+tolerance allows.
+
+python -m pyCliAddressBook.benchmarks.suite run --scales 1k 100k --output baseline.json
+python -m pyCliAddressBook.benchmarks.suite run --scales 1k 100k --baseline baseline.json
+python -m pyCliAddressBook.benchmarks.suite compare baseline.json results.json
+"""
+
+import argparse
+import builtins
+import gc
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from itertools import islice
+from typing import Callable, NamedTuple
+
+from pyCliAddressBook.benchmarks.generator import make_book, make_tree, person_fields
+
+
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+# a note per NOTES_SHARE contacts
+NOTES_SHARE = 10
+# searches of one run of find & search
+QUERIES = 100
+# changes saved by one run of save
+CHANGES = 50
+# pages rendered by one run of render
+PAGES = 10
+PAGE_SIZE = 20
+# benchmark is a regression if its median grows by more than TOLERANCE and by more than MIN_DELTA ms
+TOLERANCE = 0.2
+MIN_DELTA = 1.0
+
+
+class Trial(NamedTuple):
+    """
+    One timed run of a benchmark, prepared without timing
+    """
+    run: Callable
+    cleanup: Callable = None
+    # operations of the run, like searches
+    ops: int = 1
+    # records or files the run works with
+    items: int = None
+
+
+class Workspace:
+    """
+    Synthetic database of one scale and a folder for scratch copies
+    """
+
+    def __init__(self, folder: str, scale: str, engine: str = 'journal', seed: int = 0, max_files: int = 100000):
+        self.folder = os.path.join(folder, scale)
+        os.makedirs(self.folder)
+        self.scale = scale
+        self.size = SCALES[scale]
+        self.engine = engine
+        self.seed = seed
+        self.max_files = max_files
+        self.database = os.path.join(self.folder, 'contacts.data')
+        make_book(self.database, self.size, self.size // NOTES_SHARE, seed, engine)
+        rnd = random.Random(seed)
+        # contacts are found by parts of their fields
+        self.fields = list(person_fields(min(self.size, 10 * QUERIES), seed))
+        self.needles = [rnd.choice((name[:5], phone[-6:], email.split('@')[0][-6:], address.split(',')[0]))
+                        for name, address, phone, email, _ in rnd.sample(self.fields, QUERIES)]
+
+    def open(self, database: str = None):
+        """
+        Application with loaded records
+        """
+        from pyCliAddressBook.main import Application
+        from pyCliAddressBook.storage import open_storage
+
+        database = database or self.database
+        app = Application(database, open_storage(database, self.engine))
+        len(app.addressBook.data)
+        len(app.noteBook.data)
+        return app
+
+    def copy(self) -> tuple:
+        """
+        Copying the database, so a benchmark may change it
+        :return: tuple
+            path to the copy, cleanup removing it
+        """
+        folder = tempfile.mkdtemp(dir=self.folder)
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            if name.startswith('contacts.') and os.path.isfile(path):
+                shutil.copy2(path, folder)
+        return os.path.join(folder, 'contacts.data'), lambda: shutil.rmtree(folder, ignore_errors=True)
+
+
+@contextmanager
+def answering(answers):
+    """
+    Answering prompts of interactive commands by answers, printed text is dropped
+    """
+    answers = iter(answers)
+    original = builtins.input
+    builtins.input = lambda prompt='': next(answers)
+    try:
+        with redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        builtins.input = original
+
+
+def misspelled(word: str, rnd: random.Random) -> str:
+    """
+    Word with one typo: a letter deleted, replaced or swapped with the next one
+    """
+    while True:
+        i = rnd.randrange(1, len(word) - 1)
+        typo = rnd.choice(('delete', 'replace', 'swap'))
+        if typo == 'delete':
+            result = word[:i] + word[i + 1:]
+        elif typo == 'replace':
+            result = word[:i] + rnd.choice('aeiouy') + word[i + 1:]
+        else:
+            result = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        # replacing a letter by itself or swapping equal letters isn't a typo
+        if result != word:
+            return result
+
+
+def load(workspace: Workspace) -> Trial:
+    """
+    Opening the application and loading both books
+    """
+    apps = []
+
+    def run():
+        apps.append(workspace.open())
+
+    def cleanup():
+        for app in apps:
+            app.close()
+
+    return Trial(run, cleanup, items=workspace.size)
+
+
+def scan(workspace: Workspace) -> Trial:
+    """
+    Reading every contact & note of the loaded books, like view_all of the whole book
+    """
+    app = workspace.open()
+
+    def run():
+        for book in (app.addressBook, app.noteBook):
+            for _ in book.data.values():
+                pass
+
+    return Trial(run, app.close, items=workspace.size)
+
+
+def save(workspace: Workspace) -> Trial:
+    """
+    Closing the application after CHANGES changes, what exit does
+    """
+    database, remove = workspace.copy()
+    app = workspace.open(database)
+    rnd = random.Random(workspace.seed)
+    for number, (name, *_) in enumerate(rnd.sample(workspace.fields, CHANGES // 2)):
+        app.addressBook.update_person(name, _address=f'Kyiv, Sadova {number}')
+        app.noteBook.add_note(f'benchmark note {number}', ['benchmark'])
+
+    def cleanup():
+        app.close()
+        remove()
+
+    return Trial(app.close, cleanup, CHANGES, workspace.size)
+
+
+def snapshot(workspace: Workspace):
+    """
+    Writing the whole database, what compaction of the journal does
+    """
+    from pyCliAddressBook.storage import write_mapped, write_snapshot
+
+    writers = {'journal': write_mapped, 'pickle': write_snapshot}
+    if workspace.engine not in writers:
+        return None
+    app = workspace.open()
+    database, remove = workspace.copy()
+    sections = {'persons': app.addressBook.data, 'notes': app.noteBook.data}
+
+    def cleanup():
+        app.close()
+        remove()
+
+    return Trial(lambda: writers[workspace.engine](database, sections), cleanup, items=workspace.size)
+
+
+def find_index(workspace: Workspace) -> Trial:
+    """
+    The first find_records of the session, the index of substrings is built by it
+    """
+    app = workspace.open()
+
+    def run():
+        with answering(workspace.needles[:1]):
+            app.addressBook.find_records()
+
+    return Trial(run, app.close, items=workspace.size)
+
+
+def find(workspace: Workspace) -> Trial:
+    """
+    find_records by parts of names, phones, emails & cities
+    """
+    app = workspace.open()
+    with answering(workspace.needles[:1]):
+        app.addressBook.find_records()
+
+    def run():
+        with answering(workspace.needles):
+            for _ in workspace.needles:
+                app.addressBook.find_records()
+
+    return Trial(run, app.close, len(workspace.needles), workspace.size)
+
+
+def search_index(workspace: Workspace) -> Trial:
+    """
+    The first misspelled name of the session, the index of names is built by it
+    """
+    app = workspace.open()
+    name = misspelled(workspace.fields[0][0], random.Random(workspace.seed))
+
+    def run():
+        with answering([name]):
+            app.addressBook.get_records_dy_key()
+
+    return Trial(run, app.close, items=workspace.size)
+
+
+def search(workspace: Workspace) -> Trial:
+    """
+    get_records_dy_key by names, half of them are misspelled and get suggestions
+    """
+    app = workspace.open()
+    rnd = random.Random(workspace.seed)
+    names = [name if number % 2 else misspelled(name, rnd)
+             for number, (name, *_) in enumerate(rnd.sample(workspace.fields, QUERIES))]
+    with answering(names[:1]):
+        app.addressBook.get_records_dy_key()
+
+    def run():
+        with answering(names):
+            for _ in names:
+                app.addressBook.get_records_dy_key()
+
+    return Trial(run, app.close, len(names), workspace.size)
+
+
+def sort_birthday(workspace: Workspace) -> Trial:
+    """
+    Command_sort_birthday for the next 30 days
+    """
+    from pyCliAddressBook.autocompletion import Command_sort_birthday
+
+    app = workspace.open()
+    command = Command_sort_birthday(app.addressBook)
+    with answering(['30']):
+        command.execute()
+
+    def run():
+        with answering(['30']):
+            command.execute()
+
+    return Trial(run, app.close, items=workspace.size)
+
+
+def render(workspace: Workspace) -> Trial:
+    """
+    print_in_table of pages of contacts & notes, rendered by rich to memory
+    """
+    import pyCliAddressBook.main as main
+    from rich.console import Console
+
+    app = workspace.open()
+    persons = list(islice(app.addressBook.data.values(), PAGES * PAGE_SIZE))
+    notes = list(islice(app.noteBook.data.values(), PAGES * PAGE_SIZE))
+    original = main.console
+    main.console = Console(file=io.StringIO(), width=160, force_terminal=True, color_system='truecolor')
+
+    def run():
+        for start in range(0, PAGES * PAGE_SIZE, PAGE_SIZE):
+            app.addressBook.print_in_table(persons[start:start + PAGE_SIZE], "#", start + 1)
+            app.noteBook.print_in_table(notes[start:start + PAGE_SIZE], "#", start + 1)
+        main.console.file = io.StringIO()
+
+    def cleanup():
+        main.console = original
+        app.close()
+
+    return Trial(run, cleanup, 2 * PAGES, PAGE_SIZE)
+
+
+def file_sort(workspace: Workspace) -> Trial:
+    """
+    sorting.perform of a folder with a file per contact, up to max_files
+    """
+    import pyCliAddressBook.sorting as sorting
+
+    folder = tempfile.mkdtemp(dir=workspace.folder)
+    files = min(workspace.size, workspace.max_files)
+    make_tree(folder, files, workspace.seed)
+
+    def run():
+        with redirect_stdout(io.StringIO()):
+            sorting.perform(folder)
+
+    return Trial(run, lambda: shutil.rmtree(folder, ignore_errors=True), items=files)
+
+
+BENCHMARKS = {function.__name__: function for function in (
+    load, scan, save, snapshot, find_index, find, search_index, search, sort_birthday, render, file_sort)}
+
+
+def measure(benchmark, workspace: Workspace, repeats: int, warmup: int = 1):
+    """
+    Timing repeated trials of the benchmark
+    :return: dict or None
+        summary of the runs, None if the benchmark doesn't fit the storage engine
+    """
+    samples = []
+    trial = None
+    for number in range(warmup + repeats):
+        trial = benchmark(workspace)
+        if trial is None:
+            return None
+        try:
+            gc.collect()
+            start = time.perf_counter()
+            trial.run()
+            elapsed = time.perf_counter() - start
+        finally:
+            if trial.cleanup:
+                trial.cleanup()
+        if number >= warmup:
+            samples.append(elapsed * 1000)
+
+    median = statistics.median(samples)
+    return {'benchmark': benchmark.__name__, 'scale': workspace.scale, 'items': trial.items, 'ops': trial.ops,
+            'median_ms': round(median, 3), 'min_ms': round(min(samples), 3), 'max_ms': round(max(samples), 3),
+            'per_op_ms': round(median / trial.ops, 4), 'runs_ms': [round(sample, 3) for sample in samples]}
+
+
+def run_benchmarks(scales: list, names: list = None, repeats: int = 5, warmup: int = 1, engine: str = 'journal',
+                   seed: int = 0, max_files: int = 100000, log=None) -> dict:
+    """
+    Running benchmarks at every scale
+    :param scales: list
+        names of SCALES
+    :param names: list
+        names of BENCHMARKS, all by default
+    :param repeats: int
+        timed runs of every benchmark
+    :param warmup: int
+        runs before the timed ones
+    :param engine: str
+        storage engine of the database
+    :param seed: int
+        seed of synthetic data
+    :param max_files: int
+        files sorted by file_sort at most
+    :param log: file
+        progress is printed to, stderr by default
+    :return: dict
+        {'meta': {...}, 'results': {'benchmark/scale': summary}}
+    """
+    log = log or sys.stderr
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in scales:
+            start = time.perf_counter()
+            workspace = Workspace(folder, scale, engine, seed, max_files)
+            print(f"{scale}: data generated in {time.perf_counter() - start:.1f} s", file=log)
+            for name in names or BENCHMARKS:
+                summary = measure(BENCHMARKS[name], workspace, repeats, warmup)
+                if summary is None:
+                    print(f"{name}/{scale}: skipped for {engine} storage", file=log)
+                    continue
+                results[f'{name}/{scale}'] = summary
+                print(f"{name}/{scale}: {summary['median_ms']} ms", file=log)
+
+    meta = {'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'implementation': platform.python_implementation(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'engine': engine, 'seed': seed, 'repeats': repeats, 'warmup': warmup}
+    return {'meta': meta, 'results': results}
+
+
+def compare(baseline: dict, current: dict, tolerance: float = TOLERANCE, min_delta: float = MIN_DELTA) -> list:
+    """
+    Comparing medians of benchmarks with the baseline
+    :param tolerance: float
+        share the median may grow by
+    :param min_delta: float
+        milliseconds the median may grow by anyway, changes of short benchmarks are noise
+    :return: list
+        (name, baseline ms, current ms, status) tuples, status is
+        'regression', 'improvement', 'same', 'new' or 'missing'
+    """
+    old, new = baseline['results'], current['results']
+    rows = []
+    for name in list(old) + [name for name in new if name not in old]:
+        before = old.get(name, {}).get('median_ms')
+        after = new.get(name, {}).get('median_ms')
+        if before is None:
+            status = 'new'
+        elif after is None:
+            status = 'missing'
+        elif after > before * (1 + tolerance) and after - before > min_delta:
+            status = 'regression'
+        elif before > after * (1 + tolerance) and before - after > min_delta:
+            status = 'improvement'
+        else:
+            status = 'same'
+        rows.append((name, before, after, status))
+    return rows
+
+
+def print_comparison(baseline: dict, current: dict, rows: list, file=None) -> None:
+    file = file or sys.stdout
+    for key in ('engine', 'python', 'platform'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"Baseline {key} {baseline['meta'].get(key)} differs from {current['meta'].get(key)}", file=file)
+    print(f"{'benchmark':<24} {'baseline ms':>12} {'current ms':>12} {'change':>8}  status", file=file)
+    for name, before, after, status in rows:
+        change = f'{(after - before) / before:+.0%}' if before and after is not None else ''
+        print(f"{name:<24} {before if before is not None else '':>12} {after if after is not None else '':>12} "
+              f"{change:>8}  {status}", file=file)
+
+
+def read_results(path: str) -> dict:
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def main(argv: list = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Benchmarks of the personal assistant')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='running benchmarks, results are printed as JSON')
+    run_parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['1k', '100k'])
+    run_parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='benchmarks to run, all by default')
+    run_parser.add_argument('--repeats', type=int, default=5)
+    run_parser.add_argument('--warmup', type=int, default=1)
+    run_parser.add_argument('--engine', choices=('journal', 'pickle', 'sqlite'), default='journal')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--max-files', type=int, default=100000, help='files sorted by file_sort at most')
+    run_parser.add_argument('--output', help='file of results instead of stdout')
+    run_parser.add_argument('--baseline', help='results to compare with, regressions fail the run')
+
+    compare_parser = commands.add_parser('compare', help='comparing results with a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    for parser in (run_parser, compare_parser):
+        parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                            help='share a median may grow by, 0.2 by default')
+        parser.add_argument('--min-delta', type=float, default=MIN_DELTA,
+                            help='milliseconds a median may grow by anyway, 1 by default')
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'compare':
+        baseline, current = read_results(args.baseline), read_results(args.current)
+    else:
+        current = run_benchmarks(args.scales, args.only, args.repeats, args.warmup, args.engine, args.seed,
+                                 args.max_files)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                json.dump(current, file, indent=2)
+        else:
+            print(json.dumps(current, indent=2))
+        if not args.baseline:
+            return 0
+        baseline = read_results(args.baseline)
+
+    rows = compare(baseline, current, args.tolerance, args.min_delta)
+    # the JSON of results may be on stdout, so the comparison goes to stderr then
+    print_comparison(baseline, current, rows, sys.stdout if args.command == 'compare' or args.output else sys.stderr)
+    regressions = [name for name, _, _, status in rows if status == 'regression']
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
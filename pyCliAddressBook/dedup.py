@@ -0,0 +1,252 @@
+"""
+Finding duplicates among sorted files.
+Files in categorical folders are compared by content in three steps:
+by size, by the hash of the first block, by the hash of the whole file.
+Only files left after a step are read by the next one, so most files
+are never read at all. Hashes are read by threads and remembered
+by (device, inode, size, modification time) between runs.
+Duplicates are reported or replaced by hard links to the kept copy.
+"""
+
+import hashlib
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import NamedTuple
+
+from pyCliAddressBook.sorting import WORKERS, files_extension_to_folders, format_size
+
+
+# bytes hashed by the first step
+BLOCK_SIZE = 64 * 1024
+# bytes read at once by the whole file hashing
+CHUNK_SIZE = 1024 * 1024
+CACHE_NAME = '.file_sort.hashes'
+
+
+class Candidate(NamedTuple):
+    path: str
+    size: int
+    # (device, inode, size, modification time) identifying the content in the cache
+    key: tuple
+
+
+class HashCache:
+    """
+    Hashes of files kept in the sorted folder between runs.
+    Only hashes of files seen by the last run are saved.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        :param path: str
+            file of the cache, the cache isn't saved if it's None
+        """
+        self.path = path
+        self.hashes = {}
+        self.seen = set()
+        self.hits = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as file:
+                    self.hashes = pickle.load(file)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                self.hashes = {}
+
+    def get(self, key: tuple, kind: str):
+        self.seen.add(key)
+        digest = self.hashes.get((key, kind))
+        if digest is not None:
+            self.hits += 1
+        return digest
+
+    def put(self, key: tuple, kind: str, digest: bytes) -> None:
+        self.hashes[(key, kind)] = digest
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'wb') as file:
+            pickle.dump({item: digest for item, digest in self.hashes.items() if item[0] in self.seen},
+                        file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+
+
+def sorted_files(root: str):
+    """
+    Files of categorical folders in the folder and its subfolders
+    :return: generator
+        paths of files
+    """
+    with os.scandir(root) as iterator:
+        entries = list(iterator)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name in files_extension_to_folders:
+                yield from all_files(entry.path)
+            else:
+                yield from sorted_files(entry.path)
+
+
+def all_files(folder: str):
+    with os.scandir(folder) as iterator:
+        for entry in iterator:
+            if entry.is_file(follow_symlinks=False):
+                yield entry.path
+            elif entry.is_dir(follow_symlinks=False):
+                yield from all_files(entry.path)
+
+
+def block_hash(candidate: Candidate):
+    """
+    Hash of the first block of the file, None if it can't be read
+    """
+    try:
+        with open(candidate.path, 'rb') as file:
+            return hashlib.blake2b(file.read(BLOCK_SIZE)).digest()
+    except OSError:
+        return None
+
+
+def file_hash(candidate: Candidate):
+    """
+    Hash of the whole file, None if it can't be read
+    """
+    digest = hashlib.blake2b()
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    try:
+        with open(candidate.path, 'rb', buffering=0) as file:
+            while size := file.readinto(buffer):
+                digest.update(view[:size])
+    except OSError:
+        return None
+    return digest.digest()
+
+
+def split_groups(groups: list, kind: str, hash_function, executor, cache: HashCache) -> list:
+    """
+    Splitting groups of files by the hash, files with unique hashes are dropped
+    :param groups: list
+        lists of candidates which may be equal
+    :param kind: str
+        'block' or 'file', the kind of hash in the cache
+    :return: list
+        lists of candidates with equal hashes
+    """
+    digests = {}
+    unknown = []
+    for group in groups:
+        for candidate in group:
+            digest = cache.get(candidate.key, kind)
+            if digest is None:
+                unknown.append(candidate)
+            else:
+                digests[candidate] = digest
+
+    for candidate, digest in zip(unknown, executor.map(hash_function, unknown, chunksize=64)):
+        if digest is not None:
+            digests[candidate] = digest
+            cache.put(candidate.key, kind, digest)
+
+    split = []
+    for group in groups:
+        by_digest = {}
+        for candidate in group:
+            if candidate in digests:
+                by_digest.setdefault(digests[candidate], []).append(candidate)
+        split.extend(equal for equal in by_digest.values() if len(equal) > 1)
+    return split
+
+
+def find_duplicates(paths, workers: int = WORKERS, cache: HashCache = None) -> list:
+    """
+    Grouping files with equal content
+    :param paths: iterable
+        paths of compared files
+    :param workers: int
+        threads reading files
+    :param cache: HashCache
+        hashes of previous runs
+    :return: list
+        sorted lists of paths of equal files, hard links of one file are counted once
+    """
+    cache = cache or HashCache()
+    by_size = {}
+    for path in paths:
+        try:
+            stat = os.stat(path, follow_symlinks=False)
+        except OSError:
+            continue
+        if not stat.st_size:
+            continue
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        by_size.setdefault(stat.st_size, {}).setdefault((stat.st_dev, stat.st_ino), Candidate(path, stat.st_size, key))
+
+    groups = [list(files.values()) for files in by_size.values() if len(files) > 1]
+    with ThreadPoolExecutor(workers) as executor:
+        groups = split_groups(groups, 'block', block_hash, executor, cache)
+        # the first block is the whole small file
+        small = [group for group in groups if group[0].size <= BLOCK_SIZE]
+        large = split_groups([group for group in groups if group[0].size > BLOCK_SIZE],
+                             'file', file_hash, executor, cache)
+
+    return sorted(sorted(candidate.path for candidate in group) for group in small + large)
+
+
+def link_duplicates(groups: list) -> list:
+    """
+    Replacing duplicates by hard links to the first file of the group
+    :return: list
+        (path, exception) pairs of files which weren't replaced
+    """
+    errors = []
+    for kept, *duplicates in groups:
+        for duplicate in duplicates:
+            temp_path = f'{duplicate}.link.tmp'
+            try:
+                os.link(kept, temp_path)
+                os.replace(temp_path, duplicate)
+            except OSError as error:
+                errors.append((duplicate, error))
+                if os.path.lexists(temp_path):
+                    os.remove(temp_path)
+    return errors
+
+
+def deduplicate(root: str, link: bool = False, workers: int = WORKERS) -> list:
+    """
+    Reporting duplicates among sorted files of the folder
+    :param root: str
+        sorted folder
+    :param link: bool
+        replacing duplicates by hard links
+    :param workers: int
+        threads reading files
+    :return: list
+        groups of equal files
+    """
+    start = perf_counter()
+    cache = HashCache(os.path.join(root, CACHE_NAME))
+    groups = find_duplicates(sorted_files(root), workers, cache)
+    cache.save()
+
+    wasted = 0
+    for kept, *duplicates in groups:
+        wasted += os.path.getsize(kept) * len(duplicates)
+        print(f"Duplicates of {kept}:")
+        for duplicate in duplicates:
+            print(f"    {duplicate}")
+
+    duplicates = sum(len(group) - 1 for group in groups)
+    if link:
+        errors = link_duplicates(groups)
+        for path, error in errors:
+            print(f"Can't link {path}: {error}")
+        print(f"{duplicates - len(errors)} duplicates replaced by hard links")
+    else:
+        print(f"{duplicates} duplicates, {format_size(wasted)} in duplicates")
+    print(f"Compared in {perf_counter() - start:.2f} s, {cache.hits} hashes from the cache")
+    return groups
@@ -0,0 +1,234 @@
+"""
+Importing contacts & notes from CSV, JSONL and vCard files.
+Rows are streamed from the file, validated by the rules of the validator
+and saved in batches, every batch is one write of the storage.
+Invalid rows are reported and skipped, the import goes on.
+"""
+
+import csv
+import json
+import os
+import re
+from datetime import datetime
+from itertools import islice
+
+import pyCliAddressBook.validator as validator
+
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl',
+           '.vcf': 'vcard', '.vcard': 'vcard'}
+
+PERSON_FIELDS = ('name', 'address', 'phone', 'email', 'birthday')
+
+
+def read_csv(path: str):
+    """
+    Reading rows of CSV file with a header
+    :return: generator
+        (line number, row as dict)
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, {key.strip().lower(): (value or '').strip()
+                                    for key, value in row.items() if key}
+
+
+def read_jsonl(path: str):
+    """
+    Reading JSON objects, one per line
+    :return: generator
+        (line number, row as dict), row is None if the line isn't a JSON object
+    """
+    with open(path, encoding='utf-8') as file:
+        for line, text in enumerate(file, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError:
+                row = None
+            yield line, row if isinstance(row, dict) else None
+
+
+def read_vcard(path: str):
+    """
+    Reading contacts of vCard file
+    :return: generator
+        (line number of BEGIN:VCARD, row as dict)
+    """
+    properties = {'FN': 'name', 'ADR': 'address', 'TEL': 'phone', 'EMAIL': 'email', 'BDAY': 'birthday'}
+    row, start = None, 0
+    for line, text in _unfold(path):
+        name, _, value = text.partition(':')
+        name = name.split(';')[0].upper()
+        if name == 'BEGIN':
+            row, start = {}, line
+        elif name == 'END' and row is not None:
+            yield start, row
+            row = None
+        elif row is not None and name in properties and properties[name] not in row:
+            if name == 'ADR':
+                value = ', '.join(part for part in value.split(';') if part)
+            row[properties[name]] = value.strip()
+
+
+def _unfold(path: str):
+    """
+    Joining vCard lines continued on the next line, which starts with a space
+    """
+    line, text = 0, None
+    with open(path, encoding='utf-8') as file:
+        for number, raw in enumerate(file, start=1):
+            raw = raw.rstrip('\r\n')
+            if raw[:1] in (' ', '\t') and text is not None:
+                text += raw[1:]
+                continue
+            if text is not None:
+                yield line, text
+            line, text = number, raw
+    if text is not None:
+        yield line, text
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl, 'vcard': read_vcard}
+
+
+def validate(rows: list, region: str = None, executor=None, workers: int = 1) -> list:
+    """
+    Checking rows by the rules used for the entered data
+    :param rows: list
+        (line number, row) pairs
+    :param region: str
+        ISO country code for phones without one
+    :param executor: Executor
+        worker processes for normalizing phones
+    :param workers: int
+        number of workers of the executor
+    :return: list
+        (line number, 'person' or 'note', fields) for valid rows,
+        (line number, None, reason) for invalid ones
+    """
+    checked = []
+    numbers = []
+    for line, row in rows:
+        if row is None:
+            checked.append((line, None, "Unreadable row"))
+            continue
+        try:
+            if row.get('note'):
+                checked.append((line, *_validate_note(row)))
+                continue
+            kind, fields = _validate_person(row)
+        except (TypeError, ValueError) as error:
+            # a bad row is rejected, others of the batch are imported
+            checked.append((line, None, f"Invalid row: {error}"))
+            continue
+        if kind and fields[2]:
+            row_region = row.get('region') or region
+            if row_region is not None and not isinstance(row_region, str):
+                checked.append((line, None, "Region must be an ISO country code like UA, GB, PL"))
+                continue
+            numbers.append((fields[2], row_region))
+        checked.append((line, kind, fields))
+
+    phones = iter(validator.normalize_phones(numbers, executor, workers))
+    for i, (line, kind, fields) in enumerate(checked):
+        if kind == 'person' and fields[2]:
+            phone, error = next(phones)
+            checked[i] = (line, None, error) if error else (line, kind, (fields[0], fields[1], phone, *fields[3:]))
+
+    return checked
+
+
+def _validate_person(row: dict):
+    name, address, phone, email, birthday = (str(row.get(field) or '').strip() for field in PERSON_FIELDS)
+    if not validator.is_valid_name(name):
+        return None, validator.NAME_ERROR
+    if email and not validator.is_valid_email(email):
+        return None, validator.EMAIL_ERROR
+    return 'person', (name, address, phone, email, birthday)
+
+
+def _validate_note(row: dict):
+    value = str(row['note']).strip()
+    keywords = row.get('keywords')
+    if keywords is None or keywords == '':
+        keywords = [keyword.replace("#", "").strip() for keyword in re.findall(r"\#.+\#", value)]
+    elif isinstance(keywords, str):
+        keywords = [keyword.strip() for keyword in keywords.split(',') if keyword.strip()]
+    elif not isinstance(keywords, list):
+        return None, "Keywords must be a list or a string"
+    date = row.get('date') or None
+    if date:
+        try:
+            date = datetime.fromisoformat(date).isoformat()
+        except (TypeError, ValueError):
+            return None, "Invalid date"
+    return 'note', (value, [str(keyword) for keyword in keywords], date)
+
+
+def import_file(app, path: str, file_format: str = None, region: str = None,
+                batch_size: int = 10000, workers: int = 1, report=print) -> tuple:
+    """
+    Importing contacts & notes from the file to the application
+    :param app: Application
+    :param path: str
+        CSV, JSONL or vCard file
+    :param file_format: str
+        'csv', 'jsonl' or 'vcard', guessed by the extension by default
+    :param region: str
+        ISO country code for phones without one
+    :param batch_size: int
+        rows saved by one write of the storage
+    :param workers: int
+        processes normalizing phones of big batches
+    :param report: callable
+        receives a message about every rejected row
+    :return: tuple
+        numbers of imported and rejected rows
+    """
+    file_format = file_format or FORMATS.get(os.path.splitext(path)[1].lower())
+    if file_format not in READERS:
+        raise ValueError(f"Unknown format of '{path}', choose one of: {', '.join(READERS)}")
+
+    imported = rejected = 0
+    rows = READERS[file_format](path)
+    executor = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(workers)
+    try:
+        while batch := list(islice(rows, batch_size)):
+            checked = validate(batch, region, executor, workers)
+            with app.storage.batch():
+                for line, kind, fields in checked:
+                    reason = fields if kind is None else _save(app, kind, fields)
+                    if reason:
+                        rejected += 1
+                        report(f"{path}:{line}: {reason}")
+                    else:
+                        imported += 1
+    finally:
+        if executor:
+            executor.shutdown()
+
+    return imported, rejected
+
+
+def _save(app, kind: str, fields: tuple):
+    """
+    Saving valid row
+    :return: str or None
+        reason if the row is rejected
+    """
+    if kind == 'note':
+        app.noteBook.add_note(*fields)
+        return None
+    try:
+        if not app.addressBook.add_person(*fields):
+            return "Contact already present"
+    except (ValueError, OverflowError):
+        return "Invalid birthday"
+    return None
@@ -0,0 +1,799 @@
+"""
+In-memory indexes of the address book & note book.
+Every index is built from the records of a book on the first search
+and is kept in sync by adding, updating and deleting records afterwards.
+A persistent index is loaded from its file instead of being built.
+"""
+
+import heapq
+import math
+import os
+import pickle
+import re
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, insort
+
+from pyCliAddressBook.metrics import metrics
+
+
+class RecordIndex(ABC):
+    """
+    Interface of indexes kept by Application_Dict.
+    An index remembers what it needs about every key, because records
+    are changed in place before they are saved again.
+    """
+
+    @abstractmethod
+    def add(self, key, record) -> None:
+        """
+        Indexing added record, or reindexing changed one
+        """
+
+    @abstractmethod
+    def discard(self, key) -> None:
+        """
+        Removing record from the index
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removing all records from the index
+        """
+
+    # persistent indexes are saved next to the database by save(path) and load(path, records)
+    persistent = False
+
+    def build(self, records: dict) -> None:
+        for key, record in records.items():
+            self.add(key, record)
+
+
+class TrigramIndex(RecordIndex):
+    """
+    Inverted index of substrings.
+    ________________________________________________
+
+    Text of every record is split to overlapping trigrams,
+    every trigram keeps the set of records containing it.
+    A needle is checked only against records which contain all its trigrams.
+    Records are numbered in the order they were added, like keys of a dict,
+    so results come in the order of the book.
+    """
+
+    size = 3
+
+    def __init__(self, text_of):
+        """
+        :param text_of: callable
+            normalized text of the record
+        """
+        self.text_of = text_of
+        self.texts = {}
+        self.ids = {}
+        self.keys = {}
+        self.postings = {}
+        self.next_id = 0
+
+    def add(self, key, record):
+        text = self.text_of(record)
+        record_id = self.ids.get(key)
+        if record_id is None:
+            record_id = self.ids[key] = self.next_id
+            self.keys[record_id] = key
+            self.next_id += 1
+            old_grams = set()
+        else:
+            old_grams = self.grams(self.texts[key])
+
+        new_grams = self.grams(text)
+        for gram in old_grams - new_grams:
+            self._unpost(gram, record_id)
+        for gram in new_grams - old_grams:
+            self.postings.setdefault(gram, set()).add(record_id)
+        self.texts[key] = text
+
+    def discard(self, key):
+        record_id = self.ids.pop(key, None)
+        if record_id is None:
+            return
+        del self.keys[record_id]
+        for gram in self.grams(self.texts.pop(key)):
+            self._unpost(gram, record_id)
+
+    def clear(self):
+        self.texts.clear()
+        self.ids.clear()
+        self.keys.clear()
+        self.postings.clear()
+
+    def search(self, needle: str) -> list:
+        """
+        Keys of records which text contains needle
+        :param needle: str
+            normalized substring
+        :return: list
+            keys in the order records were added
+        """
+        if len(needle) < self.size:
+            metrics.scanned(len(self.texts))
+            return [key for key, text in self.texts.items() if needle in text]
+
+        candidates = None
+        for posting in sorted((self.postings.get(gram, ()) for gram in self.grams(needle)), key=len):
+            candidates = set(posting) if candidates is None else candidates & posting
+            if not candidates:
+                return []
+
+        metrics.scanned(len(candidates))
+        keys = (self.keys[record_id] for record_id in sorted(candidates))
+        return [key for key in keys if needle in self.texts[key]]
+
+    def grams(self, text: str) -> set:
+        return {text[i:i + self.size] for i in range(len(text) - self.size + 1)}
+
+    def _unpost(self, gram: str, record_id: int) -> None:
+        posting = self.postings[gram]
+        posting.discard(record_id)
+        if not posting:
+            del self.postings[gram]
+
+
+class TagIndex(RecordIndex):
+    """
+    Inverted index of tags.
+    ________________________________________________
+
+    Every tag keeps the set of keys of records tagged by it.
+    Tags are also kept sorted, so tags with a prefix are found by bisection.
+    """
+
+    def __init__(self, tags_of):
+        """
+        :param tags_of: callable
+            tags of the record
+        """
+        self.tags_of = tags_of
+        self.tags = {}
+        self.postings = {}
+        self.sorted_tags = []
+
+    def add(self, key, record):
+        new_tags = set(self.tags_of(record))
+        old_tags = self.tags.get(key, set())
+        for tag in old_tags - new_tags:
+            self._unpost(tag, key)
+        for tag in new_tags - old_tags:
+            if tag not in self.postings:
+                self.postings[tag] = set()
+                insort(self.sorted_tags, tag)
+            self.postings[tag].add(key)
+        self.tags[key] = new_tags
+
+    def discard(self, key):
+        for tag in self.tags.pop(key, ()):
+            self._unpost(tag, key)
+
+    def clear(self):
+        self.tags.clear()
+        self.postings.clear()
+        self.sorted_tags.clear()
+
+    def lookup(self, tag: str, prefix: bool = False) -> set:
+        """
+        Keys of records tagged by tag
+        :param tag: str
+            whole tag or its beginning
+        :param prefix: bool
+            looking for all tags beginning with tag
+        :return: set
+            posting of the index itself for a whole tag, it must not be changed
+        """
+        if not prefix:
+            keys = self.postings.get(tag, set())
+            metrics.scanned(len(keys))
+            return keys
+
+        keys = set()
+        for i in range(bisect_left(self.sorted_tags, tag), len(self.sorted_tags)):
+            if not self.sorted_tags[i].startswith(tag):
+                break
+            keys |= self.postings[self.sorted_tags[i]]
+        metrics.scanned(len(keys))
+        return keys
+
+    def _unpost(self, tag: str, key) -> None:
+        posting = self.postings[tag]
+        posting.discard(key)
+        if not posting:
+            del self.postings[tag]
+            del self.sorted_tags[bisect_left(self.sorted_tags, tag)]
+
+
+class BirthdayIndex(RecordIndex):
+    """
+    Birthdays sorted by (month, day).
+    ________________________________________________
+
+    Entries are (month, day, number, key) tuples, where number keeps
+    the order of the book for contacts born on the same day.
+    Contacts born in a period of the year are found by two bisections.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.entry_of = {}
+        self.next_id = 0
+
+    def build(self, records):
+        for key, record in records.items():
+            self.entry_of[key] = (record.birthday.month, record.birthday.day, self.next_id, key)
+            self.next_id += 1
+        self.entries = sorted(self.entry_of.values())
+
+    def add(self, key, record):
+        old_entry = self.entry_of.get(key)
+        if old_entry is None:
+            record_id = self.next_id
+            self.next_id += 1
+        else:
+            record_id = old_entry[2]
+        entry = (record.birthday.month, record.birthday.day, record_id, key)
+        if entry == old_entry:
+            return
+        if old_entry is not None:
+            del self.entries[bisect_left(self.entries, old_entry)]
+        insort(self.entries, entry)
+        self.entry_of[key] = entry
+
+    def discard(self, key):
+        entry = self.entry_of.pop(key, None)
+        if entry is not None:
+            del self.entries[bisect_left(self.entries, entry)]
+
+    def clear(self):
+        self.entries.clear()
+        self.entry_of.clear()
+
+    def between(self, start: tuple, end: tuple) -> list:
+        """
+        Contacts born from start to end inclusive
+        :param start: tuple
+            (month, day)
+        :param end: tuple
+            (month, day), not before start
+        :return: list
+            (month, day, key) tuples ordered by day
+        """
+        low = bisect_left(self.entries, start)
+        high = bisect_left(self.entries, (end[0], end[1] + 1), low)
+        metrics.scanned(high - low)
+        return [(month, day, key) for month, day, _, key in self.entries[low:high]]
+
+
+class FullTextIndex(RecordIndex):
+    """
+    Positional inverted index of words ranked by BM25.
+    ________________________________________________
+
+    Records are numbered in the order they were added. Every word keeps
+    arrays of numbers of records containing it, of starts of positions
+    of the word in every record and of the positions themselves.
+    Every block of 128 records of a word also keeps the biggest frequency
+    of the word and the shortest length of a record in the block,
+    which bound scores of the block.
+
+    A changed record gets a new number, the old one is left deleted
+    in the arrays until deleted records outnumber alive ones,
+    then the arrays are compacted. As in other engines, deleted records
+    are still counted by frequencies of words until compaction.
+
+    Words of the query are scored from the rarest one. A block is skipped
+    when its bound with bounds of the words left can't lift a new record
+    to the top, then only records found before are scored.
+    "Quoted words" are a phrase, records must contain them in this order.
+
+    The index is saved to a file with checksums of texts of records,
+    so only records changed since saving are indexed again after loading.
+    """
+
+    persistent = True
+    version = 1
+    k1 = 1.2
+    b = 0.75
+    block = 128
+    word = re.compile(r'\w+')
+
+    def __init__(self, text_of):
+        """
+        :param text_of: callable
+            text of the record
+        """
+        self.text_of = text_of
+        self.clear()
+
+    def clear(self):
+        self.ids = {}
+        self.keys = []
+        self.lengths = array('I')
+        self.checksums = array('I')
+        # word -> (records, starts, positions, block frequencies, block lengths)
+        self.postings = {}
+        self.total_length = 0
+        self.deleted = 0
+        self.dirty = True
+
+    def tokenize(self, text: str) -> list:
+        return self.word.findall(text.lower())
+
+    def add(self, key, record):
+        text = self.text_of(record)
+        checksum = zlib.crc32(text.encode())
+        record_id = self.ids.get(key)
+        if record_id is not None:
+            if self.checksums[record_id] == checksum:
+                return
+            self._delete(record_id)
+
+        record_id = self.ids[key] = len(self.keys)
+        words = self.tokenize(text)
+        self.keys.append(key)
+        self.lengths.append(len(words))
+        self.checksums.append(checksum)
+        self.total_length += len(words)
+        self.dirty = True
+
+        positions = {}
+        for position, word in enumerate(words):
+            positions.setdefault(word, []).append(position)
+        for word, places in positions.items():
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = (array('I'), array('I'), array('I'), array('I'), array('I'))
+            self._post(posting, record_id, places, len(words))
+
+    def _post(self, posting: tuple, record_id: int, places, length: int) -> None:
+        records, starts, positions, block_frequencies, block_lengths = posting
+        if len(records) % self.block == 0:
+            block_frequencies.append(len(places))
+            block_lengths.append(length)
+        else:
+            block_frequencies[-1] = max(block_frequencies[-1], len(places))
+            block_lengths[-1] = min(block_lengths[-1], length)
+        records.append(record_id)
+        starts.append(len(positions))
+        positions.extend(places)
+
+    def discard(self, key):
+        record_id = self.ids.pop(key, None)
+        if record_id is not None:
+            self._delete(record_id)
+
+    def _delete(self, record_id: int) -> None:
+        self.ids.pop(self.keys[record_id], None)
+        self.keys[record_id] = None
+        self.total_length -= self.lengths[record_id]
+        self.deleted += 1
+        self.dirty = True
+        if self.deleted > 1000 and self.deleted > len(self.ids):
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Removing deleted records from the arrays
+        """
+        new_ids = array('l', [-1]) * len(self.keys)
+        keys, lengths, checksums = [], array('I'), array('I')
+        for record_id, key in enumerate(self.keys):
+            if key is not None:
+                new_ids[record_id] = len(keys)
+                keys.append(key)
+                lengths.append(self.lengths[record_id])
+                checksums.append(self.checksums[record_id])
+
+        postings = {}
+        for word, (records, starts, places, _, _) in self.postings.items():
+            posting = (array('I'), array('I'), array('I'), array('I'), array('I'))
+            for i, record_id in enumerate(records):
+                if new_ids[record_id] >= 0:
+                    self._post(posting, new_ids[record_id], places[starts[i]:self._end(starts, places, i)],
+                               lengths[new_ids[record_id]])
+            if posting[0]:
+                postings[word] = posting
+
+        self.keys, self.lengths, self.checksums, self.postings = keys, lengths, checksums, postings
+        self.ids = {key: record_id for record_id, key in enumerate(keys)}
+        self.deleted = 0
+
+    @staticmethod
+    def _end(starts, places, i: int) -> int:
+        return starts[i + 1] if i + 1 < len(starts) else len(places)
+
+    def search(self, query: str, k: int = 10) -> list:
+        """
+        Keys of records matching the query best
+        :param query: str
+            words, "quoted words" must be found as a phrase
+        :param k: int
+            number of records
+        :return: list
+            keys ordered by score, then by the order records were added
+        """
+        words = [word for word in dict.fromkeys(self.tokenize(query)) if word in self.postings]
+        candidates = None
+        for phrase in re.findall(r'"([^"]*)"', query):
+            phrase = self.tokenize(phrase)
+            if not phrase:
+                continue
+            found = self._phrase(phrase)
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return []
+        if not words or k <= 0:
+            return []
+
+        scores = self._score(words, candidates, k)
+        metrics.scanned(len(scores))
+        best = heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.keys[record_id] for record_id, _ in best]
+
+    def _score(self, words: list, candidates, k: int) -> dict:
+        """
+        Scores of records which may be in the top k
+        """
+        count = len(self.keys)
+        k1, b, size = self.k1, self.b, self.block
+        # BM25 is tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average length))
+        norm = k1 * (1 - b)
+        scale = k1 * b / (self.total_length / max(len(self.ids), 1) or 1)
+
+        terms = []
+        for word in words:
+            posting = self.postings[word]
+            frequency = len(posting[0])
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            bound = max(tf / (tf + norm + scale * length) for tf, length in zip(posting[3], posting[4]))
+            terms.append((frequency, idf * (k1 + 1), bound, word))
+        terms.sort()
+        # the best score the words from i-th one can add to a record
+        rest = [0.0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            rest[i] = rest[i + 1] + terms[i][1] * terms[i][2]
+
+        scores = dict.fromkeys(candidates, 0.0) if candidates is not None else {}
+        only_found = candidates is not None
+        lengths, keys = self.lengths, self.keys
+        for i, (frequency, weight, _, word) in enumerate(terms):
+            records, starts, places, block_frequencies, block_lengths = self.postings[word]
+            # the k-th score, records are scored once by the first word, so the top is kept by a heap
+            top = heapq.nlargest(k, scores.values())
+            threshold = top[-1] if len(top) == k else -1.0
+            # a record tied with the k-th one may win by its number, so ties aren't skipped
+            if not only_found and threshold > rest[i]:
+                only_found = True
+            heap = [] if not scores else None
+
+            if only_found and len(scores) * 20 < frequency:
+                for record_id in scores:
+                    j = bisect_left(records, record_id)
+                    if j < len(records) and records[j] == record_id:
+                        tf = self._end(starts, places, j) - starts[j]
+                        scores[record_id] += weight * tf / (tf + norm + scale * lengths[record_id])
+                continue
+
+            if only_found:
+                for j, record_id in enumerate(records):
+                    if record_id in scores:
+                        tf = self._end(starts, places, j) - starts[j]
+                        scores[record_id] += weight * tf / (tf + norm + scale * lengths[record_id])
+                continue
+
+            found = sorted(scores)
+            for block in range(len(block_frequencies)):
+                first, last = block * size, min(block * size + size, len(records))
+                tf = block_frequencies[block]
+                if threshold >= 0 and weight * tf / (tf + norm + scale * block_lengths[block]) + rest[i + 1] < threshold:
+                    # no new record of the block can reach the top, only records found before are scored
+                    for record_id in found[bisect_left(found, records[first]):bisect_left(found, records[last - 1] + 1)]:
+                        j = bisect_left(records, record_id, first, last)
+                        if j < last and records[j] == record_id:
+                            tf = self._end(starts, places, j) - starts[j]
+                            scores[record_id] += weight * tf / (tf + norm + scale * lengths[record_id])
+                    continue
+
+                for j in range(first, last):
+                    record_id = records[j]
+                    if keys[record_id] is None:
+                        continue
+                    tf = (starts[j + 1] if j + 1 < len(starts) else len(places)) - starts[j]
+                    score = scores.get(record_id, 0.0) + weight * tf / (tf + norm + scale * lengths[record_id])
+                    scores[record_id] = score
+                    if heap is not None:
+                        if len(heap) < k:
+                            heapq.heappush(heap, score)
+                        elif score > heap[0]:
+                            heapq.heapreplace(heap, score)
+                        if len(heap) == k:
+                            threshold = heap[0]
+        return scores
+
+    def _phrase(self, phrase: list) -> set:
+        """
+        Numbers of records containing words of the phrase one after another
+        """
+        if any(word not in self.postings for word in phrase):
+            return set()
+        postings = [self.postings[word] for word in phrase]
+        rarest = min(postings, key=lambda posting: len(posting[0]))
+        found = set()
+        for record_id in rarest[0]:
+            if self.keys[record_id] is None:
+                continue
+            starts = None
+            for offset, (records, word_starts, places, _, _) in enumerate(postings):
+                j = bisect_left(records, record_id)
+                if j == len(records) or records[j] != record_id:
+                    starts = None
+                    break
+                shifted = {place - offset for place in places[word_starts[j]:self._end(word_starts, places, j)]}
+                starts = shifted if starts is None else starts & shifted
+                if not starts:
+                    break
+            if starts:
+                found.add(record_id)
+        return found
+
+    def save(self, path: str) -> None:
+        """
+        Saving the index atomically, if it's changed since loading
+        """
+        if not self.dirty:
+            return
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as file:
+            pickle.dump((self.version, self.keys, self.lengths, self.checksums, self.postings,
+                         self.total_length, self.deleted), file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        self.dirty = False
+
+    def load(self, path: str, records: dict) -> bool:
+        """
+        Loading saved index and indexing records changed since saving
+        :return: bool
+            False if there is no valid saved index
+        """
+        try:
+            with open(path, 'rb') as file:
+                state = pickle.load(file)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return False
+        if not isinstance(state, tuple) or state[0] != self.version:
+            return False
+
+        (_, self.keys, self.lengths, self.checksums, self.postings,
+         self.total_length, self.deleted) = state
+        self.ids = {key: record_id for record_id, key in enumerate(self.keys) if key is not None}
+        self.dirty = False
+        for key in [key for key in self.ids if key not in records]:
+            self.discard(key)
+        for key, record in records.items():
+            self.add(key, record)
+        return True
+
+
+class FuzzyIndex(RecordIndex):
+    """
+    Deletion dictionary of words for lookup with typos.
+    ________________________________________________
+
+    Every distinct word of texts of records is indexed by strings made
+    by deleting up to max_distance letters from its first prefix letters,
+    a longer word is also indexed so by its last prefix letters.
+    Two words within the distance share such strings, so words close
+    to a misspelled one are found by deleting letters from it and looking
+    the results up. Candidates are checked by the edit distance,
+    a swap of neighbouring letters is one edit.
+    Every word keeps the set of keys of records containing it.
+    """
+
+    max_distance = 2
+    prefix = 7
+    word = re.compile(r'\w+')
+
+    def __init__(self, text_of):
+        """
+        :param text_of: callable
+            text of the record
+        """
+        self.text_of = text_of
+        self.clear()
+
+    def clear(self):
+        self.words = {}
+        # word -> set of keys
+        self.postings = {}
+        # deleted string -> word, or set of words if there are several ones
+        self.deletes = {}
+        # the same for ends of words longer than prefix
+        self.end_deletes = {}
+
+    def tokenize(self, text: str) -> set:
+        return set(self.word.findall(text.lower()))
+
+    def add(self, key, record):
+        words = self.tokenize(self.text_of(record))
+        old_words = set(self.words.get(key, ()))
+        for word in old_words - words:
+            self._unpost(word, key)
+        for word in words - old_words:
+            if word not in self.postings:
+                self.postings[word] = set()
+                for deletes, variant in self._variants(word):
+                    self._link(deletes, variant, word)
+            self.postings[word].add(key)
+        self.words[key] = tuple(words)
+
+    def discard(self, key):
+        for word in self.words.pop(key, ()):
+            self._unpost(word, key)
+
+    def search(self, query: str, k: int = 10, max_distance: int = None) -> list:
+        """
+        Records nearest to the query, every word of the query must be close to a word of the record
+        :param query: str
+            words with typos
+        :param k: int
+            number of records
+        :param max_distance: int
+            edit distance allowed for every word, by default 0 for words up to 2 letters,
+            1 for words up to 5 letters and 2 for longer ones
+        :return: list
+            (distance, key) tuples ordered by distance, then by key,
+            distance is the sum of distances of words of the query
+        """
+        distances = None
+        for word in self.tokenize(query):
+            bound = self.bound(word) if max_distance is None else min(max_distance, self.max_distance)
+            nearest = {}
+            for found, distance in sorted(self.lookup(word, bound).items(), key=lambda item: item[1]):
+                for key in self.postings[found]:
+                    nearest.setdefault(key, distance)
+            metrics.scanned(len(nearest))
+            if distances is None:
+                distances = nearest
+            else:
+                distances = {key: distance + nearest[key] for key, distance in distances.items() if key in nearest}
+            if not distances:
+                return []
+        if not distances or k <= 0:
+            return []
+
+        return heapq.nsmallest(k, ((distance, key) for key, distance in distances.items()))
+
+    def lookup(self, word: str, bound: int) -> dict:
+        """
+        Indexed words within the edit distance from the word
+        :return: dict
+            word -> distance
+        """
+        candidates = self._candidates(self.deletes, self.variants(word, bound))
+        ends = self._candidates(self.end_deletes, self.variants(word[::-1], bound))
+        found = {}
+        for candidate in candidates:
+            # a close word longer than prefix has a close end too
+            if len(candidate) > self.prefix and candidate not in ends:
+                continue
+            distance = self.distance(word, candidate, bound)
+            if distance <= bound:
+                found[candidate] = distance
+        return found
+
+    @staticmethod
+    def bound(word: str) -> int:
+        return 0 if len(word) <= 2 else 1 if len(word) <= 5 else 2
+
+    @classmethod
+    def variants(cls, word: str, distance: int) -> set:
+        """
+        Strings made by deleting up to distance letters from the beginning of the word
+        """
+        level = {word[:cls.prefix]}
+        variants = set(level)
+        for _ in range(distance):
+            level = {text[:i] + text[i + 1:] for text in level for i in range(len(text))}
+            variants |= level
+        return variants
+
+    @staticmethod
+    def distance(a: str, b: str, bound: int) -> int:
+        """
+        Edit distance of words, a swap of neighbouring letters is one edit
+        :return: int
+            distance, or bound + 1 if it's bigger than bound
+        """
+        if a == b:
+            return 0
+        if abs(len(a) - len(b)) > bound:
+            return bound + 1
+        start = len(os.path.commonprefix((a, b)))
+        end = len(os.path.commonprefix((a[start:][::-1], b[start:][::-1])))
+        # a swapped pair must not be split by the common beginning or end
+        start, end = max(start - 1, 0), max(end - 1, 0)
+        a, b = a[start:len(a) - end], b[start:len(b) - end]
+
+        # only cells within bound from the diagonal can be within bound
+        over = bound + 1
+        before = None
+        previous = [j if j <= bound else over for j in range(len(b) + 1)]
+        for i in range(1, len(a) + 1):
+            current = [over] * (len(b) + 1)
+            if i <= bound:
+                current[0] = i
+            letter = a[i - 1]
+            least = current[0]
+            for j in range(max(1, i - bound), min(len(b), i + bound) + 1):
+                if letter == b[j - 1]:
+                    distance = previous[j - 1]
+                else:
+                    distance = min(previous[j], current[j - 1], previous[j - 1]) + 1
+                    if i > 1 and j > 1 and letter == b[j - 2] and a[i - 2] == b[j - 1]:
+                        distance = min(distance, before[j - 2] + 1)
+                current[j] = distance
+                least = min(least, distance)
+            if least > bound:
+                return over
+            before, previous = previous, current
+        return min(previous[-1], over)
+
+    def _variants(self, word: str):
+        """
+        (deletes, variant) pairs indexing the word
+        """
+        for variant in self.variants(word, self.max_distance):
+            yield self.deletes, variant
+        if len(word) > self.prefix:
+            for variant in self.variants(word[::-1], self.max_distance):
+                yield self.end_deletes, variant
+
+    @staticmethod
+    def _candidates(deletes: dict, variants: set) -> set:
+        candidates = set()
+        for variant in variants:
+            linked = deletes.get(variant)
+            if linked is None:
+                continue
+            if isinstance(linked, str):
+                candidates.add(linked)
+            else:
+                candidates |= linked
+        return candidates
+
+    @staticmethod
+    def _link(deletes: dict, variant: str, word: str) -> None:
+        linked = deletes.get(variant)
+        if linked is None:
+            deletes[variant] = word
+        elif isinstance(linked, str):
+            deletes[variant] = {linked, word}
+        else:
+            linked.add(word)
+
+    @staticmethod
+    def _unlink(deletes: dict, variant: str, word: str) -> None:
+        linked = deletes[variant]
+        if isinstance(linked, str):
+            del deletes[variant]
+            return
+        linked.discard(word)
+        if len(linked) == 1:
+            deletes[variant] = linked.pop()
+
+    def _unpost(self, word: str, key) -> None:
+        posting = self.postings[word]
+        posting.discard(key)
+        if not posting:
+            del self.postings[word]
+            for deletes, variant in self._variants(word):
+                self._unlink(deletes, variant, word)
@@ -1,15 +1,17 @@
-import pickle
+import argparse
+import calendar
 import os
 import re
-from datetime import datetime
+import sys
+from datetime import date, datetime, timedelta
 from pyCliAddressBook.autocompletion import Invoker
 import pyCliAddressBook.validator as validator
+from pyCliAddressBook.metrics import metrics
+from pyCliAddressBook.indexes import BirthdayIndex, FullTextIndex, FuzzyIndex, TagIndex, TrigramIndex
+from pyCliAddressBook.storage import AutosaveStorage, JournalStorage, LazyLoad, Storage, open_storage
 # from autocompletion import Invoker
 # import validator as validator
 
-from dateutil import parser
-from rich.console import Console
-from rich.table import Table
 from abc import ABC, abstractmethod
 from collections import UserDict
 
@@ -18,12 +20,42 @@ CLI_UI = '''
 CMD HELPER: 1.Add 2.View all 3.Search 4.Find 5.Sort 6.Update 7.Delete 8.Reset 9.File sort 10. Help 11.Exit
 '''
 
-console = Console()
+# rich is slow to import, so the console is created by the first table
+console = None
+# formats of importer.READERS, the importer is imported by the import command
+IMPORT_FORMATS = ('csv', 'jsonl', 'vcard')
+
+
+def get_console():
+    global console
+    if console is None:
+        from rich.console import Console
+
+        console = Console()
+    return console
 
 
 class Application_Dict(ABC, UserDict):
+    section = None
+    # name -> factory of the index, indexes are built on first use
+    index_factories = {}
+    # records are taken from the source on first use of data
+    _source = None
+
+    @property
+    def data(self) -> dict:
+        if self._source is not None:
+            source, self._source = self._source, None
+            self._data = source.get(self.section, {})
+        return self._data
+
+    @data.setter
+    def data(self, records: dict):
+        self._source = None
+        self._data = records
+
     @abstractmethod
-    def __init__(self, dict_application: dict):
+    def __init__(self, dict_application: dict, storage: Storage = None):
         ...
 
     @abstractmethod
@@ -50,72 +82,232 @@ class Application_Dict(ABC, UserDict):
     def find_records(self):
         ...
 
+    def _store(self, key, record):
+        """
+        Saving added or changed record in the book and in the storage
+        """
+        self.data[key] = record
+        for index in self._indexes.values():
+            index.add(key, record)
+        if self.storage:
+            self.storage.put(self.section, key, record)
+
+    def _discard(self, key):
+        """
+        Removing record from the book and from the storage
+        """
+        self.data.pop(key)
+        for index in self._indexes.values():
+            index.discard(key)
+        if self.storage:
+            self.storage.delete(self.section, key)
+
+    def reset_records(self):
+        """
+        Removing all records from the book and from the storage
+        """
+        self.data.clear()
+        for index in self._indexes.values():
+            index.clear()
+        if self.storage:
+            self.storage.reset(self.section)
+
+    def _index(self, name: str):
+        """
+        Getting index of the book, building it from the records on first use
+        """
+        if name not in self._indexes:
+            index = self.index_factories[name]()
+            path = self._index_path(name)
+            if not (index.persistent and path and index.load(path, self.data)):
+                index.build(self.data)
+            self._indexes[name] = index
+        return self._indexes[name]
+
+    def _index_path(self, name: str):
+        """
+        File of persistent index next to the database, None without storage
+        """
+        database = getattr(self.storage, 'database', None)
+        return f'{database}.{self.section}-{name}.idx' if database else None
+
+    def save_indexes(self):
+        """
+        Saving persistent indexes, so they aren't built by the next session
+        """
+        for name, index in self._indexes.items():
+            path = self._index_path(name)
+            if index.persistent and path:
+                index.save(path)
+
+    def _query(self, query: str, *args):
+        """
+        Pushing filtering down to the storage
+        :return: list or None
+            found records, None if the storage can't answer the query
+        """
+        if self._open_storage() is None:
+            return None
+        keys = getattr(self.storage, query)(self.section, *args)
+        if keys is None:
+            return None
+        return [self.data[key] for key in keys]
+
+    def _open_storage(self):
+        """
+        Getting storage of the book for a query.
+        Storages are opened by loading, so records are loaded first.
+        """
+        if self.storage is not None and self._source is not None:
+            self.data = self._source.get(self.section, {})
+        return self.storage
+
 
 class NoteBook(Application_Dict):
 
     """
     This class maneges elements of diary.
     """
+    section = "notes"
+    index_factories = {'tags': lambda: TagIndex(lambda note: note.keyWords),
+                       'text': lambda: FullTextIndex(lambda note: f"{note.value} {' '.join(note.keyWords)}")}
+    # notes found by find_notes, the best matches first
+    found_limit = 100
 
-    def __init__(self, dict_application: dict):
+    def __init__(self, dict_application: dict, storage: Storage = None):
         UserDict.__init__(self)
-        if dict_application.get("notes"):
-            self.data = dict_application.get("notes")
+        self.storage = storage
+        self._indexes = {}
+        self._source = dict_application
 
     def add_record(self):
         value, keyWords = self.get_note()
+        self.add_note(value, keyWords)
+
+    def add_note(self, value: str, keyWords: list, date: str = None) -> str:
+        """
+        Adding note without prompts
+        :param value: str
+            text of the note
+        :param keyWords: list
+            keywords of the note
+        :param date: str
+            ISO date of the note, now by default
+        :return: str
+            date the note is saved under, a microsecond later if the date is taken
+        """
         note = Note(value, keyWords)
-        self.data[note.date] = note
+        if date:
+            note.date = date
+        while note.date in self.data:
+            note.date = (datetime.fromisoformat(note.date) + timedelta(microseconds=1)).isoformat()
+        self._store(note.date, note)
+        return note.date
 
     def update_record(self, record):
 
         record.print_in_table()
         print("Will be changed")
         value, keyWords = self.get_note()
-        self.data[record.date].keyWords = keyWords or record.keyWords
-        self.data[record.date].value = value or record.value
+        self.update_note(record.date, value, keyWords)
+
+    def update_note(self, date: str, value: str = "", keyWords: list = None) -> bool:
+        """
+        Changing note without prompts, empty fields are kept
+        :return: bool
+            False if there is no note with the date
+        """
+        note = self.data.get(date)
+        if note is None:
+            return False
+        note.keyWords = keyWords or note.keyWords
+        note.value = value or note.value
+        self._store(date, note)
+        return True
 
     def delete_record(self, record):
 
         record.print_in_table()
         print("Was deleted")
-        self.data.pop(record.date)
+        self._discard(record.date)
 
-    def get_records_dy_key(self):
+    def delete_note(self, date: str) -> bool:
+        """
+        Deleting note without prompts
+        :return: bool
+            False if there is no note with the date
+        """
+        if date not in self.data:
+            return False
+        self._discard(date)
+        return True
 
-        keyword = input("Enter the key word to note: ")
-        note_list_keyword = []
-        for note in self.data.values():
-            keywords = note.get_keywords()
-            if keyword in keywords:
-                note_list_keyword.append(note)
+    def get_records_dy_key(self):
 
-            if note_list_keyword:
-                return note_list_keyword
+        keyword = metrics.input("Enter the key word to note (tag* by beginning, tag & tag, tag | tag): ")
+        keys = self.search_tags(keyword)
+        if keys:
+            return [self.data[key] for key in keys]
 
         return None
 
+    def search_tags(self, query: str) -> list:
+        """
+        Searching notes by tags.
+        'tag' finds notes tagged exactly by tag, 'tag*' by any tag beginning with tag,
+        'a & b' finds notes tagged by both, 'a | b' by any of them; '&' binds tighter.
+        :param query: str
+        :return: list
+            keys of found notes, ordered by date
+        """
+        found = set()
+        for alternative in query.split("|"):
+            postings = []
+            for tag in alternative.split("&"):
+                tag = tag.strip()
+                postings.append(self._tag_keys(tag[:-1], prefix=True) if tag.endswith("*") else self._tag_keys(tag))
+            postings.sort(key=len)
+            found |= postings[0].intersection(*postings[1:])
+        metrics.returned(len(found))
+        return sorted(found)
+
+    def _tag_keys(self, tag: str, prefix: bool = False) -> set:
+        if self._open_storage():
+            keys = self.storage.keys_by_tag(self.section, tag, prefix)
+            if keys is not None:
+                return set(keys)
+        return self._index('tags').lookup(tag, prefix)
+
     def find_records(self):
 
-        keyword = input("What are you looking for?: ")
-        note_list = []
-        for note in self.data.values():
-            keywords = note.get_keywords()
-            if keyword.lower() in str(note).lower():
-                note_list.append(note)
+        keyword = metrics.input('What are you looking for? ("words" for a phrase): ')
+        return self.search_text(keyword, self.found_limit)
 
-        return note_list
+    def search_text(self, query: str, k: int = 10) -> list:
+        """
+        Searching notes by words of their text & keywords, ranked by BM25
+        :param query: str
+            words, "quoted words" are searched as a phrase
+        :param k: int
+            number of notes
+        :return: list
+            found notes, the best matches first
+        """
+        found = [self.data[key] for key in self._index('text').search(query, k)]
+        metrics.returned(len(found))
+        return found
 
     @staticmethod
     def get_note():
 
-        userInput = input("Note (keywords as #words#): ")
+        userInput = metrics.input("Note (keywords as #words#): ")
         keywords = re.findall(r"\#.+\#", userInput)
         value = userInput.strip()
         return value, [keyword.replace("#", "").strip() for keyword in keywords]
 
     @staticmethod
-    def print_in_table(notes: list, table_name: str):
+    def print_in_table(notes: list, table_name: str, start: int = 1):
+        from rich.table import Table
 
         table = Table(show_header=True,
                       header_style="bold blue", show_lines=True)
@@ -124,69 +316,186 @@ class NoteBook(Application_Dict):
         table.add_column("DATE", min_width=12, justify="center")
         table.add_column("VALUE", min_width=50, justify="center")
 
-        for idx, note in enumerate(notes, start=1):
+        for idx, note in enumerate(notes, start=start):
             table.add_row(str(
                 idx), f'[cyan]{datetime.fromisoformat(note.date).strftime("%m/%d/%Y, %H:%M:%S")}[/cyan]', f'[cyan]{note.value}[/cyan]')
 
-        console.print(table)
+        get_console().print(table)
 
 
 class AddressBook(Application_Dict):
     """
     This class maneges elements of address book.
     """
-
-    def __init__(self, dict_application: dict):
+    section = "persons"
+    index_factories = {'text': lambda: TrigramIndex(lambda person: str(person).lower()),
+                       'birthday': BirthdayIndex,
+                       'names': lambda: FuzzyIndex(lambda person: person.name)}
+    # contacts printed by search_fuzzy & names suggested for a misspelled name
+    similar_limit = 10
+    suggested_limit = 3
+
+    def __init__(self, dict_application: dict, storage: Storage = None):
         UserDict.__init__(self)
-        if dict_application.get("persons"):
-            self.data = dict_application.get("persons")
+        self.storage = storage
+        self._indexes = {}
+        self._source = dict_application
 
     def add_record(self):
-        name, _address, _phone, _email, _birthday = self.get_details()
+        name, address, phone, email, birthday = self.get_details()
+        if not self.add_person(name, address, phone, email, birthday):
+            print("Contact already present")
+
+    def add_person(self, name: str, _address: str = "", _phone: str = "", _email: str = "", _birthday: str = "") -> bool:
+        """
+        Adding contact without prompts, empty fields get default values
+        :return: bool
+            False if the contact is already present
+        """
         address = _address or "NULL"
         phone = _phone or "NULL"
         email = _email or "NULL"
         birthday = _birthday or "1900-01-01"
-        if name not in self.data:
-            self.data[name] = Person(name, address, phone, email, birthday)
-        else:
-            print("Contact already present")
+        if name in self.data:
+            return False
+        self._store(name, Person(name, address, phone, email, birthday))
+        return True
 
     def update_record(self, record):
 
         record.print_tab()
         print("Found. Enter new details and keep empty fields if no any changes")
         _name, _address, _phone, _email, _birthday = self.get_details()
-        name = _name or record.name
+        if _name and _name != record.name and _name in self.data:
+            print("Contact already present")
+            _name = ""
+        self.update_person(record.name, _name, _address, _phone, _email, _birthday)
+
+    def update_person(self, key: str, _name: str = "", _address: str = "", _phone: str = "", _email: str = "",
+                      _birthday: str = "") -> bool:
+        """
+        Changing contact without prompts, empty fields are kept
+        :param key: str
+            current name of the contact
+        :return: bool
+            False if there is no such contact or the new name is taken
+        """
+        record = self.data.get(key)
+        if record is None:
+            return False
+        name = _name or key
+        if name != key and name in self.data:
+            return False
         address = _address or record.address
         phone = _phone or record.phone
         email = _email or record.email
         birthday = _birthday or str(record.birthday)
-        record.__init__(
-            name, address, phone, email, birthday)
+        # the contact is changed in place only when the birthday is valid
+        changed = Person(name, address, phone, email, birthday)
+        record.__setstate__(changed.__getstate__())
+        if name != key:
+            self._discard(key)
+        self._store(name, record)
+        return True
 
     def delete_record(self, record):
 
         record.print_tab()
         print("Was deleted")
-        self.data.pop(record.name)
+        self._discard(record.name)
+
+    def delete_person(self, name: str) -> bool:
+        """
+        Deleting contact without prompts
+        :return: bool
+            False if there is no such contact
+        """
+        if name not in self.data:
+            return False
+        self._discard(name)
+        return True
 
     def get_records_dy_key(self):
-        name = input("Enter the name: ")
+        name = metrics.input("Enter the name: ")
         if name in self.data:
             return [self.data[name]]
 
+        # records are changed by exact names only, close ones are just suggested
+        similar = self.search_fuzzy(name, self.suggested_limit)
+        if similar:
+            print(f"Did you mean: {', '.join(person.name for person in similar)}?")
         return None
 
+    def get_similar_records(self):
+        name = metrics.input("Enter the name, typos are allowed: ")
+        return self.search_fuzzy(name, self.similar_limit)
+
+    def search_fuzzy(self, name: str, k: int = 10, max_distance: int = None) -> list:
+        """
+        Searching contacts by name with typos.
+        Every word of name must be close to a word of the name of the contact.
+        :param name: str
+        :param k: int
+            number of contacts
+        :param max_distance: int
+            edit distance allowed for every word, up to 2, by default it depends on the length of the word
+        :return: list
+            contacts ordered by the sum of edit distances, then by name
+        """
+        found = [self.data[key] for _, key in self._index('names').search(name, k, max_distance)]
+        metrics.returned(len(found))
+        return found
+
     def find_records(self):
 
-        obj = input('What do you want to find? ')
-        records = []
-        for contact in self.data.values():
-            if obj.lower() in str(contact).lower():
-                records.append(contact)
+        obj = metrics.input('What do you want to find? ')
+        return self.find_persons(obj)
 
-        return records
+    def find_persons(self, needle: str) -> list:
+        """
+        Searching contacts which any field contains needle, case insensitive
+        :return: list
+            found contacts in the order of the book
+        """
+        found = self._query('find_keys', needle)
+        if found is None:
+            found = [self.data[key] for key in self._index('text').search(needle.lower())]
+        metrics.returned(len(found))
+        return found
+
+    def birthdays_between(self, first: date, last: date) -> list:
+        """
+        Contacts which have birthday from first to last date inclusive.
+        29 February is celebrated on 28 February in non-leap years.
+        :param first: date
+        :param last: date
+        :return: list
+            (birthday date, name) tuples ordered by date
+        """
+        birthdays = []
+        for year in range(first.year, last.year + 1):
+            start = max(first, date(year, 1, 1))
+            end = min(last, date(year, 12, 31))
+            if start > end:
+                continue
+            end_day = (end.month, end.day)
+            if end_day == (2, 28) and not calendar.isleap(year):
+                end_day = (2, 29)
+
+            for month, day, name in self._birthdays((start.month, start.day), end_day):
+                if (month, day) == (2, 29) and not calendar.isleap(year):
+                    day = 28
+                birthdays.append((date(year, month, day), name))
+
+        metrics.returned(len(birthdays))
+        return birthdays
+
+    def _birthdays(self, start: tuple, end: tuple) -> list:
+        if self._open_storage():
+            found = self.storage.keys_by_birthday(self.section, start, end)
+            if found is not None:
+                return found
+        return self._index('birthday').between(start, end)
 
     @staticmethod
     def get_details():
@@ -196,14 +505,15 @@ class AddressBook(Application_Dict):
             fields of address book: name, address, phone, email, birthday
         """
         name = validator.name_validator()
-        address = input("Address: ")
+        address = metrics.input("Address: ")
         phone = validator.phone_check()
         email = validator.email_check()
-        birthday = input("Birthday [format yyyy-mm-dd]: ")
+        birthday = metrics.input("Birthday [format yyyy-mm-dd]: ")
         return name, address, phone, email, birthday
 
     @staticmethod
-    def print_in_table(persons: list, table_name: str):
+    def print_in_table(persons: list, table_name: str, start: int = 1):
+        from rich.table import Table
 
         table = Table(show_header=True,
                       header_style="bold blue", show_lines=True)
@@ -213,13 +523,12 @@ class AddressBook(Application_Dict):
         table.add_column("PHONE", min_width=18, justify="center")
         table.add_column("EMAIL", min_width=18, justify="center")
         table.add_column("BIRTHDAY", min_width=15, justify="center")
-        for idx, person in enumerate(persons, start=1):
-            _ = person.__dict__
+        for idx, person in enumerate(persons, start=start):
             table.add_row(
-                str(idx), f'[cyan]{_["name"]}[/cyan]', f'[cyan]{_["address"]}[/cyan]', f'[cyan]{_["phone"]}[/cyan]',
-                f'[cyan]{_["email"]}[/cyan]', f'[cyan]{_["birthday"].date()}[/cyan]'
+                str(idx), f'[cyan]{person.name}[/cyan]', f'[cyan]{person.address}[/cyan]', f'[cyan]{person.phone}[/cyan]',
+                f'[cyan]{person.email}[/cyan]', f'[cyan]{date.fromordinal(person._birthday)}[/cyan]'
             )
-        console.print(table)
+        get_console().print(table)
 
 
 class Application:
@@ -227,28 +536,38 @@ class Application:
     This class maneges components of the application.
     """
 
-    def __init__(self, database):
+    storage = None
+
+    def __init__(self, database, storage: Storage = None):
 
         self.database = database
+        # changes are saved by a background thread, the prompt doesn't wait for the disk
+        storage = AutosaveStorage(storage or JournalStorage(database))
 
-        dict_application = {}
-        if not os.path.exists(self.database):
-            file_pointer = open(self.database, 'wb')
-            pickle.dump({}, file_pointer)
-            file_pointer.close()
-        else:
-            with open(self.database, 'rb') as Application:
-                dict_application = pickle.load(Application)
+        # the database is loaded when a command touches records
+        self.dict_application = LazyLoad(storage)
 
-        self.addressBook = AddressBook(dict_application)
-        self.noteBook = NoteBook(dict_application)
+        self.addressBook = AddressBook(self.dict_application, storage)
+        self.noteBook = NoteBook(self.dict_application, storage)
         self.components = {'addressBook': self.addressBook,
                            'noteBook': self.noteBook}
+        self.storage = storage
+
+    def close(self):
+        """
+        Finishing work with the storage. Changes are already saved in the
+        background, only the ones made since the last autosave are written here.
+        """
+        if self.storage:
+            if self.dict_application.loaded:
+                for book in self.components.values():
+                    book.save_indexes()
+            self.storage.close({"persons": self.addressBook.data,
+                                "notes": self.noteBook.data} if self.dict_application.loaded else None)
+            self.storage = None
 
     def __del__(self):
-        with open(self.database, 'wb') as db:
-            pickle.dump({"persons": self.addressBook.data,
-                        "notes": self.noteBook.data}, db)
+        self.close()
 
     def __str__(self):
         return CLI_UI
@@ -269,8 +588,8 @@ class Person:
         phone of the contact
     email : str
         email of the contact
-    birthday : str
-        birthday of the contact
+    birthday : datetime
+        birthday of the contact, kept as an ordinal day
 
     Methods
     _______
@@ -279,6 +598,8 @@ class Person:
 
     """
 
+    __slots__ = ('name', 'address', 'phone', 'email', '_birthday')
+
     def __init__(self, name: str = None, address: str = None, phone: str = None, email: str = None, birthday: str = None):
         """
         Creating fields of the address book
@@ -294,33 +615,58 @@ class Person:
             birthday of the contact
         """
         self.name = name
-        self.address = address
-        self.phone = phone
-        self.email = email
-        self.birthday = parser.parse(birthday)
+        self.address = _intern(address)
+        self.phone = _intern(phone, unique=True)
+        self.email = _intern(email, unique=True)
+        try:
+            self._birthday = datetime.fromisoformat(birthday).toordinal()
+        except ValueError:
+            from dateutil import parser
+
+            self._birthday = parser.parse(birthday).toordinal()
+
+    @property
+    def birthday(self) -> datetime:
+        return datetime.fromordinal(self._birthday)
 
     def __getitem__(self, i):
-        return self.__dict__[i]
+        return getattr(self, i)
+
+    def __getstate__(self):
+        return self.name, self.address, self.phone, self.email, self._birthday
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # pickled before __slots__: fields in __dict__, birthday as datetime
+            state = (state['name'], state['address'], state['phone'], state['email'],
+                     state['birthday'].toordinal())
+        name, address, phone, email, self._birthday = state
+        self.name = name
+        self.address = _intern(address)
+        self.phone = _intern(phone, unique=True)
+        self.email = _intern(email, unique=True)
 
     def __str__(self):
         """
         Returning all data of the contact as a string
         :return: str
         """
-        return f"{self.name}, {self.address}, {self.phone}, {self.email}, {self.birthday.date()}"
+        return f"{self.name}, {self.address}, {self.phone}, {self.email}, {date.fromordinal(self._birthday)}"
 
     def print_tab(self):
         """
         Printing data of the contact as a formatted table
         :return: None
         """
+        from rich.table import Table
+
         table = Table(show_header=False,
                       header_style="bold blue", show_lines=True)
         table.add_row(
             f'[cyan]{self.name}[/cyan]', f'[cyan]{self.address}[/cyan]', f'[cyan]{self.phone}[/cyan]',
-            f'[cyan]{self.email}[/cyan]', f'[cyan]{self.birthday.date()}[/cyan]'
+            f'[cyan]{self.email}[/cyan]', f'[cyan]{date.fromordinal(self._birthday)}[/cyan]'
         )
-        console.print(table)
+        get_console().print(table)
 
 
 class Note:
@@ -344,6 +690,8 @@ class Note:
 
     """
 
+    __slots__ = ('date', 'value', 'keyWords')
+
     def __init__(self, value: str, keyWords: list) -> None:
         """
         Creating fields of the diary
@@ -354,7 +702,17 @@ class Note:
         """
         self.date = datetime.now().isoformat()
         self.value = value
-        self.keyWords = keyWords
+        self.keyWords = [_intern(keyword) for keyword in keyWords]
+
+    def __getstate__(self):
+        return self.date, self.value, self.keyWords
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # pickled before __slots__: fields in __dict__
+            state = (state['date'], state['value'], state['keyWords'])
+        self.date, self.value, keyWords = state
+        self.keyWords = [_intern(keyword) for keyword in keyWords]
 
     def get_keywords(self):
         """
@@ -369,31 +727,179 @@ class Note:
         Printing notes as a formatted table
         :return: None
         """
+        from rich.table import Table
+
         table = Table(show_header=False,
                       header_style="bold blue", show_lines=True)
         table.add_row(
             f'[cyan]{datetime.fromisoformat(self.date).strftime("%m/%d/%Y, %H:%M:%S")}[/cyan]', f'[cyan]{self.value}[/cyan]')
-        console.print(table)
+        get_console().print(table)
 
     def __str__(self):
         return "{:<25} {}".format(datetime.fromisoformat(self.date).strftime("%m/%d/%Y, %H:%M:%S"), self.value)
 
 
-def cli():
+def _intern(value, unique: bool = False):
+    """
+    Sharing one copy of repeated strings (tags, addresses, 'NULL') between records
+    :param unique: bool
+        the field is unique per record (phone, email), only its 'NULL' placeholder is shared,
+        interning other values would only grow the intern table
+    """
+    if not isinstance(value, str) or unique and value != 'NULL':
+        return value
+    return sys.intern(value)
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    """
+    Parsing arguments of the assistant command
+    :param argv: list
+        arguments, sys.argv by default
+    :return: Namespace
+    """
+    arg_parser = argparse.ArgumentParser(
+        prog='assistant', description='Personal assistant with command line interface')
+    arg_parser.add_argument('--metrics', help='JSON file metrics are written to periodically and on exit')
+    arg_parser.add_argument('--metrics-interval', type=float, default=60.0,
+                            help='seconds between writes of --metrics file')
+    arg_parser.add_argument('--profile',
+                            help='folder of cProfile (.prof) & tracemalloc (.tracemalloc) dumps of every command')
+    commands = arg_parser.add_subparsers(dest='command')
+
+    import_parser = commands.add_parser(
+        'import', help='Importing contacts & notes from CSV, JSONL or vCard file')
+    import_parser.add_argument('file', help='file to import')
+    import_parser.add_argument('--format', choices=IMPORT_FORMATS,
+                               help='format of the file, guessed by the extension by default')
+    import_parser.add_argument('--region', help='ISO country code for phones without one, like UA, GB, PL etc.')
+    import_parser.add_argument('--batch-size', type=int, default=10000,
+                               help='rows saved by one write of the storage')
+    import_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                               help='processes normalizing phones, all CPU cores by default')
+
+    batch_parser = commands.add_parser(
+        'batch', help='Performing commands of JSONL file without prompts, printing JSON results')
+    batch_parser.add_argument('file', nargs='?', default='-', help='file of commands, stdin by default')
+    batch_parser.add_argument('--batch-size', type=int, default=1000,
+                              help='commands saved by one write of the storage')
+
+    serve_parser = commands.add_parser(
+        'serve', help='Serving the book to local clients, commands are JSON objects like in batch')
+    serve_parser.add_argument('--socket', default='contacts.data.sock',
+                              help='Unix socket for JSON lines, contacts.data.sock by default, empty to disable')
+    serve_parser.add_argument('--port', type=int, help='port of HTTP on 127.0.0.1, POST a command as the body')
+
+    sort_parser = commands.add_parser(
+        'sort', help='Sorting files to categorical folders, like file_sort command')
+    sort_parser.add_argument('folder', nargs='?', default='', help='folder for sorting, the current one by default')
+    sort_parser.add_argument('--dry-run', action='store_true',
+                             help='printing planned operations without changing anything')
+    sort_parser.add_argument('--workers', type=int, help='threads moving files')
+    sort_parser.add_argument('--archive-workers', type=int,
+                             help='archives unpacked at the same time, all CPU cores by default')
+    sort_parser.add_argument('--copy-budget', type=int, default=256,
+                             help='megabytes copied at the same time to categorical folders on another filesystem')
+    sort_parser.add_argument('--dedup', choices=('report', 'link'),
+                             help='printing duplicates among sorted files, link - replacing them by hard links')
+    sort_parser.add_argument('--watch', action='store_true',
+                             help='sorting new files of the folder until Ctrl-C is pressed')
+    sort_parser.add_argument('--settle', type=float, default=2.0,
+                             help='seconds a new file must stay unchanged before it is sorted by --watch')
+    sort_parser.add_argument('--interval', type=float, default=1.0,
+                             help='seconds between checks of new files by --watch')
+    sort_parser.add_argument('--poll', action='store_true',
+                             help='polling the folder by --watch even if inotify is available')
+
+    args = arg_parser.parse_args(argv)
+    if args.command == 'serve' and not args.socket and args.port is None:
+        serve_parser.error("nothing to serve on: give --socket or --port")
+    return args
+
+
+def open_application(database: str = 'contacts.data') -> Application:
+    """
+    Opening the database with the storage engine chosen by ASSISTANT_STORAGE
+    """
+    return Application(database, open_storage(
+        database, os.environ.get('ASSISTANT_STORAGE', 'journal')))
+
+
+def cli(argv: list = None):
     """
     Comparing inputted command with existing ones
     and performing correspondent command
     :return: None
     """
-    app = Application('contacts.data')
-    invoker = Invoker(app)
-    while True:
-        print(app)
-        command = invoker.choose_command()
-        continuation = command.execute()
-        if not continuation:
-            break
+    args = parse_args(argv)
+    if args.profile:
+        metrics.enable_profile(args.profile)
+    if args.metrics:
+        metrics.start_writing(args.metrics, args.metrics_interval)
+    try:
+        if args.command:
+            # a command of the command line is profiled as a whole
+            metrics.call(args.command, perform_command, args)
+        else:
+            perform_command(args)
+    finally:
+        metrics.stop_writing()
+
+
+def perform_command(args: argparse.Namespace) -> None:
+    """
+    Performing the command of the command line, the interactive mode without one
+    """
+    if args.command == 'sort':
+        import pyCliAddressBook.sorting as sorting
+
+        workers = args.workers or sorting.WORKERS
+        archive_workers = args.archive_workers or sorting.ARCHIVE_WORKERS
+        if args.watch:
+            from pyCliAddressBook.watching import watch
+
+            watch(args.folder, args.settle, args.interval, args.poll, workers, archive_workers)
+        else:
+            sorting.perform(args.folder, args.dry_run, workers, archive_workers, args.dedup,
+                            args.copy_budget * 1024 * 1024)
+        return
+
+    app = open_application()
+    try:
+        if args.command == 'import':
+            import pyCliAddressBook.importer as importer
+
+            imported, rejected = importer.import_file(
+                app, args.file, args.format, args.region, args.batch_size, args.workers)
+            print(f"Imported: {imported}, rejected: {rejected}")
+            return
+        if args.command == 'batch':
+            import pyCliAddressBook.batch as batch
+
+            performed, failed = batch.perform_file(app, args.file, args.batch_size)
+            print(f"Performed: {performed}, failed: {failed}", file=sys.stderr)
+            return
+        if args.command == 'serve':
+            from pyCliAddressBook.serving import serve
+
+            serve(app, args.socket, args.port)
+            return
+
+        invoker = Invoker(app)
+        while True:
+            print(app)
+            command = invoker.choose_command()
+            continuation = invoker.execute(command)
+            error = app.storage.take_error()
+            if error:
+                print(f"Changes aren't saved yet, they'll be saved later: {error}")
+            if not continuation:
+                break
+    finally:
+        app.close()
 
 
 if __name__ == '__main__':
+    # records are pickled with the module name, so they must come from pyCliAddressBook.main, not __main__
+    from pyCliAddressBook.main import cli
     cli()
@@ -0,0 +1,234 @@
+"""
+Metrics of the application.
+Latency of every command and of loading & saving the storage is kept
+as a histogram of buckets growing twice, from 10 microseconds to 80 seconds,
+so percentiles are known without keeping every sample. Time a command
+waits for the user at its prompts (metrics.input) isn't its latency.
+Searches count records they scanned and records they returned, the storage
+counts bytes it read and wrote. Metrics are printed by the stats command
+and written to a JSON file periodically with --metrics.
+With --profile every command is profiled by cProfile & tracemalloc, their
+dumps are written to the folder. Without it a command costs two clock reads.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# upper bounds of buckets in milliseconds, the last bucket is for longer ones
+BOUNDS = tuple(0.01 * 2 ** i for i in range(24))
+# frames of tracebacks kept by tracemalloc
+TRACE_FRAMES = 10
+
+
+class Histogram:
+    """
+    Latencies of one operation
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'high')
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.high = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect_left(BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.high = max(self.high, ms)
+
+    def percentile(self, share: float) -> float:
+        """
+        Upper bound of the bucket of the percentile, never above the maximum
+        :param share: float
+            0.5 for the median, 0.99 for the 99th percentile
+        """
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= share * self.count and seen:
+                return min(BOUNDS[i], self.high) if i < len(BOUNDS) else self.high
+        return 0.0
+
+    def summary(self) -> dict:
+        return {'count': self.count, 'mean_ms': round(self.total / max(self.count, 1), 3),
+                'p50_ms': round(self.percentile(0.5), 3), 'p95_ms': round(self.percentile(0.95), 3),
+                'p99_ms': round(self.percentile(0.99), 3), 'max_ms': round(self.high, 3),
+                'buckets': [[round(BOUNDS[i], 2) if i < len(BOUNDS) else None, count]
+                            for i, count in enumerate(self.counts) if count]}
+
+
+class Metrics:
+    """
+    Latencies & counters of the application
+    ________________________________________________
+
+    Operations are named like 'find', 'batch.add' or 'storage.load'.
+    Records scanned & returned by searches are counted for the running command.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.counters = {}
+        # command which scanned & returned records are counted for
+        self.command = None
+        # seconds the running command waited for the user, not counted to its latency
+        self.waited = 0.0
+        self.started = time.time()
+        # folder of profiles, None if commands aren't profiled
+        self.profile = None
+        self.profiled = 0
+        self._writer = None
+        self._stop = None
+        self._path = None
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self.lock:
+            histogram = self.latency.get(name)
+            if histogram is None:
+                histogram = self.latency[name] = Histogram()
+            histogram.observe(seconds * 1000)
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def scanned(self, records: int) -> None:
+        """
+        Counting records looked at by a search of the running command
+        """
+        self.count(f'{self.command}.scanned', records)
+
+    def returned(self, records: int) -> None:
+        """
+        Counting records found by a search of the running command
+        """
+        self.count(f'{self.command}.returned', records)
+
+    def call(self, name: str, function, *args, profile: bool = True):
+        """
+        Calling function as the command name: its latency is observed,
+        records it scans are counted for it, it is profiled if profiling is on
+        """
+        previous, self.command = self.command, name
+        waited, self.waited = self.waited, 0.0
+        start = time.perf_counter()
+        try:
+            if profile and self.profile is not None:
+                return self._profiled(name, function, args)
+            return function(*args)
+        finally:
+            self.observe(name, time.perf_counter() - start - self.waited)
+            self.command = previous
+            self.waited += waited
+
+    def input(self, text: str = '') -> str:
+        """
+        input() of the running command, waiting for the user isn't counted to its latency
+        """
+        start = time.perf_counter()
+        try:
+            return input(text)
+        finally:
+            self.waited += time.perf_counter() - start
+
+    @contextmanager
+    def measure(self, name: str):
+        """
+        Observing latency of the operation in the with block
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def enable_profile(self, folder: str) -> None:
+        """
+        Profiling every command to the folder
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.profile = folder
+
+    def _profiled(self, name: str, function, args: tuple):
+        import cProfile
+        import tracemalloc
+
+        with self.lock:
+            self.profiled += 1
+            base = os.path.join(self.profile, f'{self.profiled:04d}-{name}')
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return function(*args)
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f'{base}.prof')
+            # memory kept after the command by the lines which allocated it
+            tracemalloc.take_snapshot().dump(f'{base}.tracemalloc')
+            peak = tracemalloc.get_traced_memory()[1]
+            with self.lock:
+                self.counters[f'{name}.peak_bytes'] = max(self.counters.get(f'{name}.peak_bytes', 0), peak)
+
+    def snapshot(self) -> dict:
+        """
+        All metrics as JSON-ready dict
+        """
+        with self.lock:
+            latency = {name: histogram.summary() for name, histogram in sorted(self.latency.items())}
+            counters = dict(sorted(self.counters.items()))
+        return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'uptime_s': round(time.time() - self.started, 1),
+                'pid': os.getpid(), 'latency': latency, 'counters': counters}
+
+    def write(self, path: str) -> None:
+        """
+        Writing metrics to JSON file atomically: to a temporary file which replaces the old one
+        """
+        # json isn't needed at startup, only by --metrics
+        import json
+
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, indent=2)
+        os.replace(temp_path, path)
+
+    def start_writing(self, path: str, interval: float) -> None:
+        """
+        Writing metrics to the file every interval seconds by a background thread
+        """
+        self._stop = threading.Event()
+
+        def write_periodically(stop=self._stop):
+            while not stop.wait(interval):
+                try:
+                    self.write(path)
+                except OSError:
+                    pass
+
+        self._writer = threading.Thread(target=write_periodically, name='metrics', daemon=True)
+        self._path = path
+        self._writer.start()
+
+    def stop_writing(self) -> None:
+        """
+        Stopping the background writer, the last metrics are written
+        """
+        if self._writer is None:
+            return
+        self._stop.set()
+        self._writer.join()
+        self._writer = None
+        self.write(self._path)
+
+
+metrics = Metrics()
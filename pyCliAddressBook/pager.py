@@ -0,0 +1,60 @@
+"""
+Paging of big tables.
+Only one page of records is rendered at a time, the next page is taken
+from the iterator of records when the user asks for it.
+"""
+
+import shutil
+from itertools import islice
+
+from pyCliAddressBook.metrics import metrics
+
+
+def page_size() -> int:
+    """
+    Number of records fitting the terminal, every table row takes two lines
+    :return: int
+    """
+    return max(5, (shutil.get_terminal_size().lines - 8) // 2)
+
+
+def view_pages(records, print_page, size: int = None) -> None:
+    """
+    Printing records page by page.
+    Enter shows the next page, a number jumps to the record with this number,
+    q stops viewing.
+    :param records: iterable
+        collection of records, it is iterated again to jump back
+    :param print_page: callable
+        prints one page, receives the list of records and the number of the first one
+    :param size: int
+        records on the page, fitting the terminal by default
+    """
+    size = size or page_size()
+    iterator = iter(records)
+    position = 0
+
+    while True:
+        page = list(islice(iterator, size))
+        if page:
+            print_page(page, position + 1)
+            position += len(page)
+            hint = f"Records {position - len(page) + 1}-{position}."
+        else:
+            hint = "No more records."
+        last = len(page) < size
+        if last:
+            answer = metrics.input(f"{hint} Number - go to record, Enter - quit: ").strip().lower()
+        else:
+            answer = metrics.input(f"{hint} Enter - next page, number - go to record, q - quit: ").strip().lower()
+
+        if answer.isdigit():
+            target = max(int(answer), 1) - 1
+            if target < position:
+                iterator = iter(records)
+                position = 0
+            # skipped records are not rendered
+            next(islice(iterator, target - position, target - position), None)
+            position = target
+        elif answer == 'q' or last:
+            break
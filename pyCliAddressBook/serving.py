@@ -0,0 +1,224 @@
+"""
+Serving the books to local clients.
+One process keeps the loaded address book & note book, clients send
+commands of the batch mode as JSON objects:
+- over a Unix socket, one command per line, one result per line;
+- over HTTP on localhost, a command is the body of POST request.
+Commands of a connection are performed in their order.
+
+Reading commands are performed as soon as they come. Changing ones are
+queued to one writer task, which performs all commands queued meanwhile
+by one write of the storage, so many clients share one flush.
+Everything runs in one thread, so readers never see a half-made change.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+
+import pyCliAddressBook.batch as batch
+
+
+# changing commands performed by one write of the storage
+GROUP_SIZE = 1000
+# longest line or head of request
+LIMIT = 1 << 20
+REASONS = {200: 'OK', 400: 'Bad Request', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+class Server:
+    """
+    Performing commands of clients on the books of the application
+    """
+
+    def __init__(self, app, group_size: int = GROUP_SIZE):
+        self.app = app
+        self.group_size = group_size
+        # (command, future of its result) pairs for the writer
+        self.queue = asyncio.Queue()
+        self.performed = 0
+
+    async def perform(self, request) -> dict:
+        self.performed += 1
+        if isinstance(request, dict) and request.get('command') in batch.CHANGING:
+            future = asyncio.get_running_loop().create_future()
+            self.queue.put_nowait((request, future))
+            return await future
+        return batch.perform(self.app, request)
+
+    async def write(self) -> None:
+        """
+        Writer task performing changing commands in groups
+        """
+        while True:
+            group = [await self.queue.get()]
+            while len(group) < self.group_size and not self.queue.empty():
+                group.append(self.queue.get_nowait())
+            try:
+                with self.app.storage.batch():
+                    results = [self.perform_changing(request) for request, _ in group]
+            except Exception as error:
+                # saving failed, every command of the group gets the error
+                results = [{'id': request.get('id'), 'ok': False, 'error': f"Can't save: {error}"}
+                           for request, _ in group]
+            for (_, future), result in zip(group, results):
+                if not future.done():
+                    future.set_result(result)
+                self.queue.task_done()
+
+    def perform_changing(self, request: dict) -> dict:
+        """
+        Performing a changing command of the writer, its failure fails only the command
+        """
+        try:
+            return batch.perform(self.app, request)
+        except Exception as error:
+            return {'id': request.get('id'), 'ok': False, 'error': f"Command failed: {error!r}"}
+
+    async def perform_line(self, line: bytes) -> dict:
+        try:
+            request = json.loads(line)
+        except ValueError as error:
+            return {'id': None, 'ok': False, 'error': f"Invalid JSON: {error}"}
+        try:
+            return await self.perform(request)
+        except Exception as error:
+            # the client gets the error and keeps its connection
+            return {'id': request.get('id') if isinstance(request, dict) else None, 'ok': False,
+                    'error': f"Command failed: {error!r}"}
+
+    async def serve_lines(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Connection of the Unix socket
+        """
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    result = await self.perform_line(line)
+                    writer.write(json.dumps(result, ensure_ascii=False).encode() + b'\n')
+                    await writer.drain()
+        except (ConnectionError, ValueError):
+            # ValueError: the line is longer than LIMIT
+            pass
+        finally:
+            writer.close()
+
+    async def serve_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Connection of HTTP/1.1, kept alive until the client closes it
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                method, _, rest = request_line.partition(' ')
+                version = rest.rpartition(' ')[2]
+                headers = {}
+                for header in header_lines:
+                    name, _, value = header.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get('content-length') or '0'
+                if not length.isdigit():
+                    await self.respond(writer, 400, {'id': None, 'ok': False, 'error': "Invalid Content-Length"})
+                    break
+                length = int(length)
+                if length > LIMIT:
+                    await self.respond(writer, 413, {'id': None, 'ok': False, 'error': "Command is too long"})
+                    break
+                body = await reader.readexactly(length)
+                if method != 'POST':
+                    result, status = {'id': None, 'ok': False, 'error': "Commands are sent by POST"}, 405
+                else:
+                    result, status = await self.perform_line(body), 200
+                await self.respond(writer, status, result)
+                if headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0':
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter, status: int, result: dict) -> None:
+        body = json.dumps(result, ensure_ascii=False).encode()
+        writer.write(f'HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+        await writer.drain()
+
+
+def is_served(path: str) -> bool:
+    """
+    Checking that the socket is accepted by a running server
+    """
+    with socket.socket(socket.AF_UNIX) as client:
+        try:
+            client.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+async def serve_forever(app, socket_path: str = None, port: int = None, group_size: int = GROUP_SIZE) -> int:
+    """
+    Serving until SIGINT or SIGTERM
+    :return: int
+        number of performed commands
+    """
+    server = Server(app, group_size)
+    writer_task = asyncio.create_task(server.write())
+    listeners = []
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        # only the user can connect to the socket
+        old_umask = os.umask(0o177)
+        try:
+            listeners.append(await asyncio.start_unix_server(server.serve_lines, socket_path, limit=LIMIT))
+        finally:
+            os.umask(old_umask)
+    if port is not None:
+        listeners.append(await asyncio.start_server(server.serve_http, '127.0.0.1', port, limit=LIMIT))
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        for listener in listeners:
+            listener.close()
+        # changes already queued are saved
+        await server.queue.join()
+        writer_task.cancel()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+    return server.performed
+
+
+def serve(app, socket_path: str = None, port: int = None, group_size: int = GROUP_SIZE) -> None:
+    """
+    Serving the books of the application over the Unix socket and/or HTTP on localhost
+    :param app: Application
+    :param socket_path: str
+        Unix socket for JSON lines
+    :param port: int
+        port of HTTP on 127.0.0.1
+    :param group_size: int
+        changing commands performed by one write of the storage
+    """
+    if socket_path and is_served(socket_path):
+        print(f"The book is already served on {socket_path}")
+        return
+    # the database is loaded before the first client comes
+    len(app.addressBook.data)
+    addresses = [address for address in (socket_path, port and f'http://127.0.0.1:{port}') if address]
+    print(f"Serving on {', '.join(addresses)}, Ctrl-C to stop")
+    performed = asyncio.run(serve_forever(app, socket_path, port, group_size))
+    print(f"Serving is stopped, {performed} commands performed")
@@ -3,15 +3,29 @@ Sorting files to categorical folders.
 Normalising names of files & folders.
 Remoting empty folders.
 Unpacking archives.
-"""
 
-from itertools import chain
+Sorting has two phases. The folder is walked once and a plan is made:
+every move of a file, unpacking of an archive, removing and renaming
+of a folder, with new names free of collisions. Then the plan is
+performed in batches, so the tree isn't changed while it is walked.
+"""
 
+import errno
+import gzip
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 import re
-from shutil import move, unpack_archive
-from typing import List
+from shutil import copyfileobj, copystat, rmtree
+import sys
+import tarfile
+from threading import BoundedSemaphore, Condition, Lock
+from time import monotonic, perf_counter
+from typing import NamedTuple
+
+from pyCliAddressBook.metrics import metrics
+from pyCliAddressBook.storage import pack_frame, read_frames
 
 
 files_extension_to_folders = {
@@ -22,6 +36,10 @@ files_extension_to_folders = {
     'archives': ['.zip', '.gz', '.tar']
     }
 
+extension_to_folder = {extension: folder
+                       for folder, extensions in files_extension_to_folders.items()
+                       for extension in extensions}
+
 cyrillic_symbols = 'абвгґдеєжзиіїйклмнопрстуфхцчшщьюяёъыэ'
 cyrillic_to_latin = ('a', 'b', 'v', 'h', 'g', 'd', 'e', 'ye',
                      'zh', 'z', 'y', 'i', 'yi', 'y', 'k', 'l',
@@ -34,90 +52,635 @@ for cyrillic, latin in zip(cyrillic_symbols, cyrillic_to_latin):
     transliteration[ord(cyrillic)] = latin
     transliteration[ord(cyrillic.upper())] = latin.upper()
 
-empty_folders = []
-folders_to_rename = []
+unacceptable_symbols = re.compile(r'\W')
+
+# moving files is I/O-bound, so threads wait for the disk, not for Python
+WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# unpacking is CPU-bound, every archive is unpacked by its own process
+ARCHIVE_WORKERS = os.cpu_count() or 1
+# files moved by one task of the pool
+BATCH_SIZE = 500
+# bytes copied at the same time by moves to another filesystem
+COPY_BUDGET = 256 * 1024 * 1024
+# bytes copied by one call of the kernel
+COPY_CHUNK = 64 * 1024 * 1024
+# journal of the performed plan, kept in the sorted folder until the plan is performed
+JOURNAL_NAME = '.file_sort.journal'
+# completed operations are synced to the journal together, at least once a second
+SYNC_OPERATIONS = 5000
+SYNC_SECONDS = 1.0
+
+
+class Operation(NamedTuple):
+    """
+    Step of the plan.
+    kind is 'move', 'unpack', 'rmdir' or 'rename',
+    size is the size of the moved file or archive in bytes
+    """
+    kind: str
+    source: str
+    target: str = ''
+    size: int = 0
 
 
-def find_files(path: Path) -> None:
+class Plan(NamedTuple):
     """
-    Recursive searching files for sorting
-    :param path: Path
-        selected folder for sorting
-    :return: None
+    Operations sorting the folder in the order they are performed:
+    moves & unpackings, then removing of empty folders,
+    then renaming of folders, nested folders before their parents
     """
-    for i in path.iterdir():
+    root: str
+    operations: tuple
+    seconds: float
 
-        if i.is_file():
+    def count(self, kind: str) -> int:
+        return sum(1 for operation in self.operations if operation.kind == kind)
 
-            if (ext := i.suffix) in chain(*files_extension_to_folders.values()):
+    def summary(self) -> str:
+        size = sum(operation.size for operation in self.operations)
+        return (f"{self.count('move')} files to move, {self.count('unpack')} archives to unpack, "
+                f"{format_size(size)} in total, {self.count('rmdir')} empty folders to remove, "
+                f"{self.count('rename')} folders to rename. Planned in {self.seconds:.2f} s")
 
-                new_name = normalize(i.stem)
 
-                if ext in files_extension_to_folders['images']:
-                    move_file(i, new_name, ext, 'images')
+class FreeNames:
+    """
+    Names taken in a folder.
+    A taken name gets the suffix _1, _2 etc., the first free one is reserved.
+    """
 
-                elif ext in files_extension_to_folders['video']:
-                    move_file(i, new_name, ext, 'video')
+    def __init__(self, names=(), folder: str = None):
+        """
+        :param names: iterable
+            names in the folder
+        :param folder: str
+            folder which isn't listed, every new name is checked on the disk instead
+        """
+        self.taken = set(names)
+        self.numbers = {}
+        self.folder = folder
+
+    def is_taken(self, name: str) -> bool:
+        return name in self.taken or (self.folder is not None and os.path.lexists(f'{self.folder}{os.sep}{name}'))
+
+    def reserve(self, name: str, ext: str = '') -> str:
+        number = self.numbers.get((name, ext), 0)
+        candidate = f'{name}_{number}{ext}' if number else f'{name}{ext}'
+        while self.is_taken(candidate):
+            number += 1
+            candidate = f'{name}_{number}{ext}'
+        self.numbers[(name, ext)] = number + 1
+        self.taken.add(candidate)
+        return candidate
+
+
+class Planner:
+    """
+    Walking the folder and collecting operations of the plan
+    """
 
-                elif ext in files_extension_to_folders['documents']:
-                    move_file(i, new_name, ext, 'documents')
+    def __init__(self):
+        self.files = []
+        self.empty_folders = []
+        self.folders_to_rename = []
+
+    def plan(self, path: str) -> Plan:
+        start = perf_counter()
+        self.find_files(path)
+        operations = (*self.files, *self.empty_folders, *reversed(self.folders_to_rename))
+        return Plan(str(path), operations, perf_counter() - start)
+
+    def find_files(self, path: str) -> bool:
+        """
+        Recursive searching files for sorting
+        :param path: str
+            selected folder for sorting
+        :return: bool
+            True if the folder isn't empty
+        """
+        with os.scandir(path) as iterator:
+            entries = list(iterator)
+        # names in categorical folders and in this one, listed when a new name is needed
+        categories = {}
+        names = None
+
+        for entry in entries:
+
+            if entry.is_file():
+
+                folder = category_of(entry.name)
+                if not folder:
+                    continue
+
+                if folder not in categories:
+                    categories[folder] = FreeNames(listdir(f'{path}{os.sep}{folder}'))
+                self.files.append(sort_file(path, entry.name, folder, categories[folder], entry.stat().st_size))
+
+            elif entry.is_dir() and entry.name not in files_extension_to_folders:
+
+                position = len(self.folders_to_rename)
+                if not self.find_files(entry.path):
+                    del self.folders_to_rename[position:]
+                    self.empty_folders.append(Operation('rmdir', entry.path))
+                    continue
+
+                # the name is reserved only by a folder which is kept, its rename goes before nested ones
+                new_name = normalize(entry.name)
+                if new_name != entry.name:
+                    if names is None:
+                        names = FreeNames([other.name for other in entries] + list(files_extension_to_folders))
+                    new_name = names.reserve(new_name)
+                    self.folders_to_rename.insert(position,
+                                                  Operation('rename', entry.path, f'{path}{os.sep}{new_name}'))
+
+        return bool(entries)
+
+
+def category_of(file_name: str) -> str:
+    """
+    Categorical folder of the file by its extension, None for unknown extensions
+    """
+    return extension_to_folder.get(os.path.splitext(file_name)[1])
+
+
+def sort_file(path: str, file_name: str, folder: str, names: FreeNames, size: int = 0) -> Operation:
+    """
+    Planning move of the file to the categorical folder or unpacking of the archive
+    :param path: str
+        folder of the file
+    :param file_name: str
+    :param folder: str
+        categorical folder name
+    :param names: FreeNames
+        names taken in the categorical folder
+    :param size: int
+        size of the file
+    :return: Operation
+    """
+    name, ext = os.path.splitext(file_name)
+    if folder == 'archives':
+        kind, new_name = 'unpack', names.reserve(normalize(name))
+    else:
+        kind, new_name = 'move', names.reserve(normalize(name), ext)
+    return Operation(kind, f'{path}{os.sep}{file_name}', f'{path}{os.sep}{folder}{os.sep}{new_name}', size)
+
+
+def listdir(path: str) -> list:
+    try:
+        return os.listdir(path)
+    except FileNotFoundError:
+        return []
 
-                elif ext in files_extension_to_folders['audio']:
-                    move_file(i, new_name, ext, 'audio')
 
-                elif ext in files_extension_to_folders['archives']:
-                    unpack_archive_file(i, new_name, ext, 'archives')
+def format_size(size: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = 'TB'
+    return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
 
-        elif i.is_dir() and not (i.name in files_extension_to_folders):
 
-            if not os.listdir(i):
-                empty_folders.append(i)
+class BoundedExecutor:
+    """
+    Pool which accepts a limited number of waiting tasks,
+    so a plan of millions of moves isn't queued in memory at once.
+    Every task receives a list of operations and returns
+    (path, exception) pairs of failed ones, they are collected to errors.
+    Numbers of completed operations are written to the journal.
+    """
+
+    def __init__(self, workers: int = WORKERS, executor_class=ThreadPoolExecutor, journal=None):
+        self.executor = executor_class(workers)
+        self.slots = BoundedSemaphore(workers * 4)
+        self.errors = []
+        self.journal = journal
+
+    def submit(self, function, operations: list, numbers: list = ()) -> None:
+        self.slots.acquire()
+        future = self.executor.submit(function, operations)
+        future.add_done_callback(partial(self._done, operations, numbers))
+
+    def _done(self, operations, numbers, future) -> None:
+        self.slots.release()
+        try:
+            errors = future.result()
+        except Exception as error:
+            errors = [(operation.source, error) for operation in operations]
+        self.errors.extend(errors)
+        if self.journal:
+            complete(self.journal, operations, numbers, errors)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+class ByteBudget:
+    """
+    Limit of bytes copied at the same time.
+    A file bigger than the whole budget is copied alone.
+    """
+
+    def __init__(self, size: int = COPY_BUDGET):
+        self.size = size
+        self.used = 0
+        self.condition = Condition()
+
+    def acquire(self, size: int) -> None:
+        with self.condition:
+            self.condition.wait_for(lambda: not self.used or self.used + size <= self.size)
+            self.used += size
+
+    def release(self, size: int) -> None:
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+
+class SortJournal:
+    """
+    Journal of the performed plan.
+    ________________________________________________
+
+    The plan is written to the sorted folder before the first operation,
+    then numbers of completed operations are appended. Appends are written
+    to the file at once and synced to the disk in groups: an operation which
+    is completed, but isn't synced when the system crashes, is performed
+    again when the sorting is resumed, and finds itself done.
+    Frames are framed like frames of the database journal, a torn tail is ignored.
+    The journal is removed when the whole plan is performed.
+    """
+
+    def __init__(self, root):
+        self.path = os.path.join(root, JOURNAL_NAME)
+        self.root = str(root)
+        self.file = None
+        self.lock = Lock()
+        self.unsynced = 0
+        self.synced_at = monotonic()
+
+    def load(self):
+        """
+        Reading plan of the interrupted sorting
+        :return: tuple
+            (Plan, set of numbers of completed operations), None if there is no journal
+        """
+        if not os.path.exists(self.path):
+            return None
+        root, seconds, operations, completed = None, 0, [], set()
+        for entry, _ in read_frames(self.path):
+            if entry[0] == 'plan':
+                root, seconds = entry[1], entry[2]
+            elif entry[0] == 'operations':
+                operations.extend(Operation(*operation) for operation in entry[1])
+            elif entry[0] == 'done':
+                completed.update(entry[1])
+        if root is None:
+            return None
+        return Plan(root, tuple(operations), seconds), completed
+
+    def start(self, plan: Plan) -> None:
+        """
+        Writing the plan, it is synced before the first operation
+        """
+        self.file = open(self.path, 'wb')
+        self.file.write(pack_frame(('plan', plan.root, plan.seconds)))
+        for i in range(0, len(plan.operations), 10000):
+            self.file.write(pack_frame(('operations', [tuple(operation) for operation in plan.operations[i:i + 10000]])))
+        self.sync()
+
+    def resume(self) -> None:
+        self.file = open(self.path, 'ab')
+
+    def done(self, numbers: list) -> None:
+        if not numbers:
+            return
+        with self.lock:
+            self.file.write(pack_frame(('done', numbers)))
+            self.unsynced += len(numbers)
+            if self.unsynced >= SYNC_OPERATIONS or monotonic() - self.synced_at >= SYNC_SECONDS:
+                self.sync()
             else:
-                folders_to_rename.append(i)
+                # a killed process doesn't lose it, only a crash of the system
+                self.file.flush()
+
+    def sync(self) -> None:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.synced_at = monotonic()
+
+    def close(self) -> None:
+        """
+        Keeping the journal of the interrupted sorting
+        """
+        if self.file:
+            with self.lock:
+                self.sync()
+                self.file.close()
+            self.file = None
+
+    def remove(self) -> None:
+        if self.file:
+            self.file.close()
+            self.file = None
+        os.remove(self.path)
+
+
+def complete(journal: SortJournal, operations: list, numbers: list, errors: list) -> None:
+    """
+    Writing numbers of operations completed without errors to the journal
+    """
+    failed = {path for path, _ in errors}
+    journal.done([number for number, operation in zip(numbers, operations) if operation.source not in failed])
 
-            find_files(i)
 
+def make_plan(path) -> Plan:
+    """
+    Planning sorting of the folder, nothing is changed
+    :param path: str or Path
+        selected folder for sorting
+    :return: Plan
+    """
+    return Planner().plan(path)
 
-def move_file(old_file_path: Path, new_name: str, ext: str, folder: str) -> None:
+
+def perform_plan(plan: Plan, workers: int = WORKERS, archive_workers: int = ARCHIVE_WORKERS,
+                 batch_size: int = BATCH_SIZE, journal: SortJournal = None, completed=frozenset(),
+                 copy_budget: int = COPY_BUDGET) -> list:
+    """
+    Performing operations of the plan.
+    Files are moved in batches by threads, archives are unpacked by processes,
+    folders are removed & renamed when all files are in place.
+    :param plan: Plan
+    :param workers: int
+        threads moving files
+    :param archive_workers: int
+        archives unpacked at the same time
+    :param batch_size: int
+        files moved by one task
+    :param journal: SortJournal
+        journal of completed operations
+    :param completed: set
+        numbers of operations completed before the sorting was interrupted
+    :param copy_budget: int
+        bytes copied at the same time by moves to another filesystem
+    :return: list
+        (path, exception) pairs of failed operations
     """
-    Moving normalized files to categorical folders
-    :param old_file_path: Path
+    # parents renamed before the sorting was interrupted hold files & folders planned under their old names
+    renames = {operation.source: operation.target for operation in plan.operations if operation.kind == 'rename'}
+    move_batch = partial(move_files, budget=ByteBudget(copy_budget), renames=renames)
+    executor = BoundedExecutor(workers, journal=journal)
+    archives = BoundedExecutor(archive_workers, ProcessPoolExecutor, journal)
+    folders = {'rmdir': ([], []), 'rename': ([], [])}
+    try:
+        batch, numbers = [], []
+        for number, operation in enumerate(plan.operations):
+            if number in completed:
+                continue
+            if operation.kind == 'move':
+                batch.append(operation)
+                numbers.append(number)
+                if len(batch) == batch_size:
+                    executor.submit(move_batch, batch, numbers)
+                    batch, numbers = [], []
+            elif operation.kind == 'unpack':
+                archives.submit(unpack_archives, [operation], [number])
+            else:
+                folders[operation.kind][0].append(operation)
+                folders[operation.kind][1].append(number)
+        if batch:
+            executor.submit(move_batch, batch, numbers)
+    finally:
+        executor.shutdown()
+        # folders are renamed when nothing is unpacked to them
+        archives.shutdown()
+
+    errors = executor.errors + archives.errors
+    if journal:
+        # files aren't moved again under old names of folders renamed below
+        with journal.lock:
+            journal.sync()
+    for kind, perform_folders in (('rmdir', remove_empty_folders),
+                                  ('rename', partial(rename_folders, renames=renames))):
+        for operation, number in zip(*folders[kind]):
+            folder_errors = perform_folders([operation])
+            if journal:
+                complete(journal, [operation], [number], folder_errors)
+            errors += folder_errors
+    return errors
+
+
+def move_files(operations: list, budget: ByteBudget = None, renames: dict = None) -> list:
+    """
+    Moving batch of files to categorical folders
+    :param budget: ByteBudget
+        bytes copied at the same time by moves to another filesystem
+    :param renames: dict
+        source -> target of all 'rename' operations of the plan,
+        files moved before their parents were renamed by the interrupted sorting are found by them
+    :return: list
+        (path, exception) pairs of failed moves
+    """
+    errors = []
+    moves = []
+    for operation in operations:
+        source, target = operation.source, operation.target
+        if renames and not os.path.lexists(source) and not os.path.exists(target):
+            source, target = current_paths(source, target, renames)
+        moves.append((operation, source, target))
+    # folders of files which are gone aren't made again
+    for folder in {os.path.dirname(target) for _, source, target in moves if os.path.lexists(source)}:
+        os.makedirs(folder, exist_ok=True)
+    for operation, source, target in moves:
+        try:
+            move_file(source, target, budget)
+        except OSError as error:
+            errors.append((operation.source, error))
+    return errors
+
+
+def move_file(old_file_path: str, new_file_path: str, budget: ByteBudget = None) -> None:
+    """
+    Moving normalized file to categorical folder.
+    The file is renamed if the folder is on the same filesystem,
+    otherwise it is copied by the kernel and removed.
+    :param old_file_path: str
         old file location
-    :param new_name: str
-        normalized file name
-    :param ext: str
-        file extension
-    :param folder: str
-        categorical folder name
+    :param new_file_path: str
+        new file location, the folder must exist
+    :param budget: ByteBudget
+        bytes copied at the same time
     :return: None
     """
-    new_path_file = Path(old_file_path.parent, folder)
-    new_path_file.mkdir(exist_ok=True, parents=True)
-    new_path = (Path(old_file_path.parent, f'{new_name}{ext}'))
-    os.rename(old_file_path, new_path)
-    move(new_path, new_path_file)
+    if os.path.exists(new_file_path):
+        if not os.path.lexists(old_file_path):
+            # moved before the sorting was interrupted
+            return
+        raise FileExistsError(f"{new_file_path} already exists")
+    try:
+        os.rename(old_file_path, new_file_path)
+        return
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+
+    size = os.stat(old_file_path).st_size
+    if budget:
+        budget.acquire(size)
+    try:
+        copy_file(old_file_path, new_file_path)
+    finally:
+        if budget:
+            budget.release(size)
+    os.remove(old_file_path)
+
+
+def copy_file(old_file_path: str, new_file_path: str) -> None:
+    """
+    Copying file with its permissions, times & owner to another filesystem.
+    The copy is written to a hidden file, synced and renamed,
+    so the new path never has a half of the file.
+    """
+    folder, name = os.path.split(new_file_path)
+    temp_path = os.path.join(folder, f'.{name}.part')
+    try:
+        with open(old_file_path, 'rb') as source, open(temp_path, 'wb') as target:
+            stat = os.fstat(source.fileno())
+            kernel_copy(source.fileno(), target.fileno(), stat.st_size)
+            os.fsync(target.fileno())
+        copystat(old_file_path, temp_path)
+        try:
+            os.chown(temp_path, stat.st_uid, stat.st_gid)
+        except (AttributeError, PermissionError):
+            pass
+        os.replace(temp_path, new_file_path)
+    except BaseException:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def kernel_copy(source: int, target: int, size: int) -> None:
+    """
+    Copying data between files without reading it to Python:
+    by copy_file_range, by sendfile if it isn't supported,
+    by reading to a buffer if neither is supported
+    :param source: int
+        descriptor of the file, at its beginning
+    :param target: int
+        descriptor of the empty file
+    :param size: int
+        bytes to copy
+    """
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < size:
+                sent = os.copy_file_range(source, target, min(COPY_CHUNK, size - copied))
+                if not sent:
+                    return
+                copied += sent
+            return
+        except OSError as error:
+            # not supported between these filesystems
+            if error.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+
+    if sys.platform.startswith('linux'):
+        while copied < size:
+            sent = os.sendfile(target, source, copied, min(COPY_CHUNK, size - copied))
+            if not sent:
+                return
+            copied += sent
+        return
+
+    os.lseek(source, copied, os.SEEK_SET)
+    with open(source, 'rb', closefd=False) as source_file, open(target, 'wb', closefd=False) as target_file:
+        copyfileobj(source_file, target_file, 1024 * 1024)
+
+
+def unpack_archives(operations: list) -> list:
+    """
+    Unpacking batch of archives
+    :return: list
+        (path, exception) pairs of failed archives
+    """
+    errors = []
+    for operation in operations:
+        try:
+            unpack_archive_file(operation.source, operation.target)
+        except Exception as error:
+            errors.append((operation.source, error))
+    return errors
 
 
-def unpack_archive_file(old_file_path: Path, new_name: str, ext: str, folder: str) -> None:
+def unpack_archive_file(old_file_path: str, new_path: str) -> None:
     """
     Working with archives.
-    Moving archives to the folder 'archives' and unpacking they there
-    :param old_file_path: Path
+    Unpacking archives to the folder 'archives' and removing them.
+    Members are unpacked one by one from the stream to a hidden folder,
+    which gets the name of the archive only when all of them are unpacked,
+    so a broken archive leaves neither a half of its files nor a lost archive.
+    :param old_file_path: str
         archive location
-    :param new_name: str
-        folder name of unpacking archive
-    :param ext: str
-        archive extension
-    :param folder: str
-        collective folder for unpacking archives, 'archives' by default
+    :param new_path: str
+        folder of unpacked archive
     :return: None
     """
-    new_path_file = Path(old_file_path.parent, folder)
-    new_path_file.mkdir(exist_ok=True, parents=True)
-    new_path = (Path(old_file_path.parent, f'{new_name}{ext}'))
-    os.rename(old_file_path, new_path)
-    unpack_archive(new_path, Path(new_path_file, new_name), ext.replace('.', ''))
-    os.remove(new_path)
+    folder, new_name = os.path.split(new_path)
+    os.makedirs(folder, exist_ok=True)
+    if os.path.exists(new_path):
+        if not os.path.lexists(old_file_path):
+            return
+        raise FileExistsError(f"{new_path} already exists")
+
+    partial_path = Path(folder, f'.{new_name}.partial')
+    rmtree(partial_path, ignore_errors=True)
+    partial_path.mkdir()
+    try:
+        ext = os.path.splitext(old_file_path)[1]
+        if ext == '.zip':
+            unpack_zip(old_file_path, partial_path)
+        else:
+            unpack_tar(old_file_path, partial_path, ext)
+        os.rename(partial_path, new_path)
+    except BaseException:
+        rmtree(partial_path, ignore_errors=True)
+        raise
+
+    os.remove(old_file_path)
+
+
+def unpack_zip(archive: Path, path: Path) -> None:
+    from zipfile import ZipFile
+
+    with ZipFile(archive) as zip_file:
+        for member in zip_file.infolist():
+            zip_file.extract(member, path)
+
+
+def unpack_tar(archive: Path, path: Path, ext: str) -> None:
+    """
+    Unpacking tar archive, compressed one too, as a stream.
+    Plain '.gz' file is unpacked to one file.
+    """
+    try:
+        with tarfile.open(archive, 'r|*') as tar_file:
+            if hasattr(tarfile, 'data_filter'):
+                tar_file.extraction_filter = tarfile.data_filter
+            for member in tar_file:
+                # old Pythons have no filter, members out of the folder are skipped
+                if member.name.startswith('/') or '..' in Path(member.name).parts or member.islnk() or member.issym():
+                    continue
+                tar_file.extract(member, path)
+    except tarfile.ReadError:
+        if ext != '.gz':
+            raise
+        with gzip.open(archive) as source, open(Path(path, Path(archive).stem), 'wb') as target:
+            copyfileobj(source, target)
 
 
 def normalize(old_name: str) -> str:
@@ -131,68 +694,176 @@ def normalize(old_name: str) -> str:
         folder/file's name after normalizing
     """
     new_name = old_name.translate(transliteration)
-    new_name = re.sub(r'\W', '_', new_name)
+    new_name = unacceptable_symbols.sub('_', new_name)
 
     return new_name
 
 
-def remove_empty_folders(folders: List[Path]) -> None:
+def remove_empty_folders(operations: list) -> list:
     """
     Removing empty folders
-    :param folders: list
-        list of empty folder in sorting folder
-    :return: None
+    :param operations: list
+        'rmdir' operations of the plan
+    :return: list
+        (path, exception) pairs of failed operations
     """
-    for folder in folders:
-        folder.rmdir()
-
-    global empty_folders
-    empty_folders = []
+    errors = []
+    for operation in operations:
+        try:
+            os.rmdir(operation.source)
+        except FileNotFoundError:
+            pass
+        except OSError as error:
+            errors.append((operation.source, error))
+    return errors
 
 
-def rename_folders(list_folders: List[Path]) -> None:
+def rename_folders(operations: list, renames: dict = None) -> list:
     """
     Renaming folders
-    :param list_folders: list
-        folder list for normalizing
-    :return: None
+    :param operations: list
+        'rename' operations of the plan, nested folders before their parents
+    :param renames: dict
+        source -> target of all 'rename' operations of the plan,
+        parents renamed by the interrupted sorting are found by them
+    :return: list
+        (path, exception) pairs of failed operations
     """
-    for folder in list_folders[::-1]:
-        new_folder_name = normalize(folder.name)
-        new_path_folder = (Path(folder.parent, f'{new_folder_name}'))
+    errors = []
+    for operation in operations:
+        source, target = operation.source, operation.target
+        if renames and not os.path.lexists(source) and not os.path.exists(target):
+            source, target = current_paths(source, target, renames)
         try:
-            os.rename(folder, new_path_folder)
-        except FileExistsError:
-            new_path_folder = (Path(folder.parent, f'{new_folder_name}_1'))
-            os.rename(folder, new_path_folder)
+            if os.path.exists(target):
+                if not os.path.lexists(source):
+                    continue
+                raise FileExistsError(f"{target} already exists")
+            os.rename(source, target)
+        except OSError as error:
+            errors.append((operation.source, error))
+    return errors
+
+
+def current_paths(source: str, target: str, renames: dict) -> tuple:
+    """
+    Paths of the operation after renames of its parents already done by the interrupted sorting.
+    Nested folders are renamed before their parents, so renamed parents are looked for from the innermost one.
+    Source & target have the same renamed parents: categorical folders aren't renamed.
+    :return: tuple
+        (source, target), the planned ones if no parent was renamed
+    """
+    for renamed_source, renamed_target in zip(renamed_paths(source, renames), renamed_paths(target, renames)):
+        if os.path.lexists(renamed_source) or os.path.exists(renamed_target):
+            return renamed_source, renamed_target
+    return source, target
+
 
-    global folders_to_rename
-    folders_to_rename = []
+def renamed_paths(path: str, renames: dict):
+    """
+    Path after renames of its parents, one more renamed parent every time, from the innermost one
+    """
+    parent, rest = os.path.split(path)
+    while parent != os.path.dirname(parent):
+        renamed = renames.get(parent)
+        if renamed is not None:
+            # the renamed parent is in the same folder as the planned one
+            parent = renamed
+            yield os.path.join(parent, rest)
+        rest = os.path.join(os.path.basename(parent), rest)
+        parent = os.path.dirname(parent)
+
+
+def print_plan(plan: Plan, file=None) -> None:
+    """
+    Printing operations of the plan, one per line
+    """
+    file = file or sys.stdout
+    file.writelines(f"{operation.kind:<6} {operation.source}"
+                    f"{' -> ' + operation.target if operation.target else ''}\n"
+                    for operation in plan.operations)
 
 
-def perform() -> None:
+def perform(sorting_folder: str = None, dry_run: bool = False,
+            workers: int = WORKERS, archive_workers: int = ARCHIVE_WORKERS, dedup: str = None,
+            copy_budget: int = COPY_BUDGET) -> None:
     """
     Sorting files to categorical folders. Normalising names of files & folders.
     Remoting empty folders. Unpacking archives.
+    Interrupted sorting of the folder is resumed by its journal without walking the folder again.
+    :param sorting_folder: str
+        folder for sorting, it is asked if isn't given
+    :param dry_run: bool
+        printing the plan without changing anything
+    :param workers: int
+        threads moving files
+    :param archive_workers: int
+        archives unpacked at the same time
+    :param dedup: str
+        'report' to print duplicates among sorted files, 'link' to replace them by hard links too
+    :param copy_budget: int
+        bytes copied at the same time to categorical folders on another filesystem
     """
 
-    while True:
-        sorting_folder = input('Enter folder for sorting: ')
-
-        if not sorting_folder:
-            path = Path().cwd()
-        else:
-            if not Path(sorting_folder).exists():
-                print("Folder isn't exist")
-                continue
-            else:
-                path = Path(sorting_folder)
-        break
-
-    find_files(path)
-    remove_empty_folders(empty_folders)
-    rename_folders(folders_to_rename)
-    print('sorting is complete')
+    while sorting_folder is None:
+        sorting_folder = metrics.input('Enter folder for sorting: ')
+
+        if sorting_folder and not Path(sorting_folder).exists():
+            print("Folder isn't exist")
+            sorting_folder = None
+
+    path = Path(sorting_folder).absolute() if sorting_folder else Path().cwd()
+    if not path.is_dir():
+        print("Folder isn't exist")
+        return
+
+    journal = SortJournal(path)
+    interrupted = journal.load()
+    if interrupted and interrupted[0].root == str(path):
+        plan, completed = interrupted
+        print(f"Resuming interrupted sorting, {len(plan.operations) - len(completed)} "
+              f"of {len(plan.operations)} operations left")
+    else:
+        plan, completed = make_plan(path), set()
+        interrupted = None
+
+    if dry_run:
+        print_plan(plan._replace(operations=tuple(operation for number, operation in enumerate(plan.operations)
+                                                  if number not in completed)))
+        print(plan.summary())
+        if dedup:
+            from pyCliAddressBook.dedup import deduplicate
+
+            deduplicate(path, False, workers)
+        return
+
+    start = perf_counter()
+    if interrupted:
+        journal.resume()
+    else:
+        journal.start(plan)
+    try:
+        errors = perform_plan(plan, workers, archive_workers, journal=journal, completed=completed,
+                              copy_budget=copy_budget)
+    except KeyboardInterrupt:
+        journal.close()
+        print('sorting is interrupted, sort the folder again to resume it')
+        return
+    except BaseException:
+        journal.close()
+        raise
+    journal.remove()
+
+    for file_path, error in errors:
+        print(f"Can't sort {file_path}: {error}")
+
+    print(plan.summary())
+    print(f'sorting is complete in {perf_counter() - start:.2f} s')
+
+    if dedup:
+        from pyCliAddressBook.dedup import deduplicate
+
+        deduplicate(path, dedup == 'link', workers)
 
 
 if __name__ == '__main__':
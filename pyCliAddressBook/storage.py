@@ -0,0 +1,1161 @@
+"""
+Storage engines of the application.
+Keeping persons & notes on the hard drive between sessions.
+Appending every change to a journal instead of rewriting the whole database.
+Mapping the snapshot to memory, so records are read only when they are used.
+Keeping persons & notes as indexed rows of a SQLite database.
+Saving changes in the background, so the prompt never waits for the disk.
+"""
+
+import copy
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import ItemsView, MutableMapping, ValuesView
+from contextlib import contextmanager
+
+from pyCliAddressBook.metrics import metrics
+
+
+SECTIONS = ('persons', 'notes')
+
+# every journal frame is prefixed by the payload length and its crc32
+FRAME_HEADER = struct.Struct('<II')
+
+# mapped snapshot: header, then table of rows & sorted index of every section, then heap of strings;
+# the header keeps rows, offset of the table & offset of the index of every section and offset of the heap
+MAPPED_MAGIC = b'ABMAP\x00\x00\x01'
+MAPPED_HEADER = struct.Struct('<8s' + 'IQQ' * len(SECTIONS) + 'Q')
+# a string is (offset in the heap, length of UTF-8), the length of None is NO_STRING
+NO_STRING = 0xFFFFFFFF
+# persons: key, name, address, phone, email, birthday as ordinal day
+# notes: key, date, value, keywords joined by NUL, number of keywords
+MAPPED_ROWS = {'persons': struct.Struct('<' + 'QI' * 5 + 'i'),
+               'notes': struct.Struct('<' + 'QI' * 4 + 'I')}
+MAPPED_KEY = struct.Struct('<QI')
+
+# autosave writes changes a second after the first unsaved one, or at once when so many are pending
+AUTOSAVE_INTERVAL = 1.0
+AUTOSAVE_CHANGES = 100
+
+
+class Storage(ABC):
+    """
+    Interface of the storage engines used by Application.
+    Address book & note book report every change to the storage,
+    each change is identified by a section ('persons' or 'notes') and a key.
+    """
+
+    @abstractmethod
+    def load(self) -> dict:
+        """
+        Loading all sections of the database
+        :return: dict
+            {'persons': {name: Person}, 'notes': {date: Note}}
+        """
+
+    @abstractmethod
+    def put(self, section: str, key: str, record) -> None:
+        """
+        Saving added or updated record
+        """
+
+    @abstractmethod
+    def delete(self, section: str, key: str) -> None:
+        """
+        Removing deleted record
+        """
+
+    @abstractmethod
+    def reset(self, section: str) -> None:
+        """
+        Removing all records of the section
+        """
+
+    def close(self, dict_application: dict) -> None:
+        """
+        Finishing work with the storage
+        :param dict_application: dict
+            current state of all sections, None if they weren't loaded
+        """
+
+    def save(self, dict_application: dict) -> None:
+        """
+        Saving the whole database after changes were written.
+        Engines which save every change by put, delete & reset need nothing here.
+        """
+
+    @contextmanager
+    def batch(self):
+        """
+        Grouping many changes to one write of the storage
+        """
+        yield
+
+    # Queries below may be pushed down to the storage.
+    # None means the storage can't answer, the book scans its records itself.
+    queries = False
+
+    def find_keys(self, section: str, needle: str):
+        """
+        Keys of records which string form contains needle, case insensitive
+        :return: list or None
+        """
+        return None
+
+    def keys_by_tag(self, section: str, tag: str, prefix: bool = False):
+        """
+        Keys of notes tagged by tag, or by any tag beginning with tag if prefix
+        :return: list or None
+        """
+        return None
+
+    def keys_by_birthday(self, section: str, start: tuple, end: tuple):
+        """
+        Persons born from start to end (month, day) inclusive
+        :return: list or None
+            (month, day, key) tuples ordered by day
+        """
+        return None
+
+
+class PickleStorage(Storage):
+    """
+    Legacy engine: the whole database is pickled to one file,
+    when it's saved after changes and on close.
+    """
+
+    def __init__(self, database: str):
+        self.database = database
+        self.changed = False
+
+    def load(self) -> dict:
+        return read_snapshot(self.database)
+
+    def put(self, section, key, record):
+        self.changed = True
+
+    def delete(self, section, key):
+        self.changed = True
+
+    def reset(self, section):
+        self.changed = True
+
+    def save(self, dict_application):
+        if self.changed:
+            # changes made while pickling are put again, so they are saved by the next snapshot
+            self.changed = False
+            try:
+                write_snapshot(self.database, dict_application)
+            except BaseException:
+                self.changed = True
+                raise
+
+    def close(self, dict_application):
+        if dict_application is not None:
+            self.save(dict_application)
+
+
+class JournalStorage(Storage):
+    """
+    Snapshot plus append-only journal (write-ahead log).
+    ________________________________________________
+
+    Every change is appended to '<database>.wal' as a small frame,
+    so saving costs the size of the change, not the size of the book.
+    On start the snapshot is loaded and the journal is replayed over it.
+    When the journal grows above compact_threshold it is moved aside and
+    folded into a new snapshot by a background thread.
+    The snapshot is mapped to memory and its records are read on first use,
+    a legacy pickled snapshot is converted by the first load.
+    """
+
+    def __init__(self, database: str, compact_threshold: int = 4 * 1024 * 1024, fsync: bool = False):
+        """
+        :param database: str
+            path to the snapshot file
+        :param compact_threshold: int
+            journal size in bytes which starts a compaction
+        :param fsync: bool
+            force every frame to the disk, not only to the OS
+        """
+        self.database = database
+        self.journal = f'{database}.wal'
+        self.compacting = f'{database}.wal.compacting'
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self._file = None
+        self._compactor = None
+        self._buffer = None
+
+    def load(self):
+        if not os.path.exists(self.database):
+            write_mapped(self.database, {})
+
+        dict_application = read_snapshot(self.database)
+        if not is_mapped(self.database):
+            write_mapped(self.database, dict_application)
+        if os.path.exists(self.compacting):
+            replay_journal(self.compacting, dict_application)
+        if os.path.exists(self.journal):
+            valid_size = replay_journal(self.journal, dict_application)
+            # cutting off a frame torn by a crash, new frames go after the last valid one
+            if valid_size != os.path.getsize(self.journal):
+                os.truncate(self.journal, valid_size)
+
+        self._file = open(self.journal, 'ab')
+        if os.path.exists(self.compacting):
+            self._start_compaction()
+        return dict_application
+
+    def put(self, section, key, record):
+        self._append(('put', section, key, record))
+
+    def delete(self, section, key):
+        self._append(('del', section, key, None))
+
+    def reset(self, section):
+        self._append(('reset', section, None, None))
+
+    def close(self, dict_application):
+        if self._compactor:
+            self._compactor.join()
+            self._compactor = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    @contextmanager
+    def batch(self):
+        if self._buffer is not None:
+            yield
+            return
+        self._buffer = bytearray()
+        try:
+            yield
+        finally:
+            frames, self._buffer = self._buffer, None
+            self._write(frames)
+
+    def _append(self, entry: tuple) -> None:
+        frame = pack_frame(entry)
+        if self._buffer is not None:
+            self._buffer += frame
+        else:
+            self._write(frame)
+
+    def _write(self, frames: bytes) -> None:
+        if not frames:
+            return
+        self._file.write(frames)
+        self._file.flush()
+        metrics.count('storage.written_bytes', len(frames))
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+        if self._file.tell() >= self.compact_threshold and not self._is_compacting():
+            self._rotate()
+
+    def _is_compacting(self) -> bool:
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def _rotate(self) -> None:
+        """
+        Moving the full journal aside and starting a fresh one
+        """
+        if self._compactor:
+            self._compactor.join()
+        self._file.close()
+        os.replace(self.journal, self.compacting)
+        self._file = open(self.journal, 'ab')
+        self._start_compaction()
+
+    def _start_compaction(self) -> None:
+        self._compactor = threading.Thread(
+            target=self._compact, name='journal-compaction')
+        self._compactor.start()
+
+    def _compact(self) -> None:
+        """
+        Folding the moved aside journal into the snapshot.
+        Works only with files, the live books are never touched.
+        Replaying is idempotent, so a crash at any point is safe.
+        """
+        with metrics.measure('storage.compact'):
+            dict_application = read_snapshot(self.database)
+            replay_journal(self.compacting, dict_application)
+            write_mapped(self.database, dict_application)
+        os.remove(self.compacting)
+
+
+class SQLiteStorage(Storage):
+    """
+    Persons & notes as rows of a local SQLite database.
+    ________________________________________________
+
+    Rows are indexed by name, email, phone, birthday month/day, note date
+    and note keyword, so searches are pushed down to the database.
+    On the first start the pickled database (with its journal) is migrated.
+    """
+
+    queries = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS persons (
+            name TEXT PRIMARY KEY,
+            address TEXT,
+            phone TEXT,
+            email TEXT,
+            birthday TEXT,
+            birth_month INTEGER,
+            birth_day INTEGER,
+            search TEXT
+        );
+        CREATE INDEX IF NOT EXISTS persons_email ON persons (email);
+        CREATE INDEX IF NOT EXISTS persons_phone ON persons (phone);
+        CREATE INDEX IF NOT EXISTS persons_birthday ON persons (birth_month, birth_day);
+        CREATE TABLE IF NOT EXISTS notes (
+            date TEXT PRIMARY KEY,
+            value TEXT,
+            keywords TEXT,
+            search TEXT
+        );
+        CREATE TABLE IF NOT EXISTS note_keywords (
+            keyword TEXT,
+            date TEXT,
+            position INTEGER,
+            PRIMARY KEY (keyword, date, position)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS note_keywords_date ON note_keywords (date);
+    """
+
+    def __init__(self, database: str, sqlite_path: str = None):
+        """
+        :param database: str
+            path to the pickled database, source of the migration
+        :param sqlite_path: str
+            path to the SQLite file, '<database without extension>.sqlite3' by default
+        """
+        self.database = database
+        self.sqlite_path = sqlite_path or f'{os.path.splitext(database)[0]}.sqlite3'
+        self.connection = None
+        self._in_batch = False
+
+    def load(self):
+        import sqlite3
+
+        migrate = not os.path.exists(self.sqlite_path)
+        self.connection = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(self.SCHEMA)
+
+        if migrate and os.path.exists(self.database):
+            legacy = JournalStorage(self.database)
+            dict_application = legacy.load()
+            legacy.close(dict_application)
+            with self.connection:
+                for section in SECTIONS:
+                    for key, record in dict_application[section].items():
+                        self._write(section, key, record)
+            return dict_application
+
+        return self._read()
+
+    def _read(self) -> dict:
+        # records are created here, main imports this module
+        from pyCliAddressBook.main import Note, Person
+
+        persons = {}
+        for name, address, phone, email, birthday in self.connection.execute(
+                'SELECT name, address, phone, email, birthday FROM persons ORDER BY rowid'):
+            persons[name] = Person(name, address, phone, email, birthday)
+
+        keywords = {}
+        for date, keyword in self.connection.execute(
+                'SELECT date, keyword FROM note_keywords ORDER BY date, position'):
+            keywords.setdefault(date, []).append(keyword)
+
+        notes = {}
+        for date, value in self.connection.execute('SELECT date, value FROM notes ORDER BY rowid'):
+            note = Note(value, keywords.get(date, []))
+            note.date = date
+            notes[date] = note
+
+        return {'persons': persons, 'notes': notes}
+
+    @contextmanager
+    def _transaction(self):
+        if self._in_batch:
+            yield
+        else:
+            with self.connection:
+                yield
+
+    @contextmanager
+    def batch(self):
+        if self._in_batch:
+            yield
+            return
+        self._in_batch = True
+        try:
+            yield
+        finally:
+            # changes are already in the books, so they are committed even on error
+            self._in_batch = False
+            if self.connection:
+                self.connection.commit()
+
+    def put(self, section, key, record):
+        with self._transaction():
+            self._write(section, key, record)
+
+    def _write(self, section: str, key: str, record) -> None:
+        if section == 'persons':
+            # upsert keeps rowid, so the order of records is kept like in dict
+            self.connection.execute(
+                """INSERT INTO persons VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (name) DO UPDATE SET address = excluded.address,
+                   phone = excluded.phone, email = excluded.email, birthday = excluded.birthday,
+                   birth_month = excluded.birth_month, birth_day = excluded.birth_day,
+                   search = excluded.search""",
+                (key, record.address, record.phone, record.email, str(record.birthday.date()),
+                 record.birthday.month, record.birthday.day, str(record).lower()))
+        else:
+            self.connection.execute(
+                """INSERT INTO notes VALUES (?, ?, ?, ?)
+                   ON CONFLICT (date) DO UPDATE SET value = excluded.value,
+                   keywords = excluded.keywords, search = excluded.search""",
+                (key, record.value, record.get_keywords(), str(record).lower()))
+            self.connection.execute('DELETE FROM note_keywords WHERE date = ?', (key,))
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO note_keywords VALUES (?, ?, ?)',
+                [(keyword, key, position) for position, keyword in enumerate(record.keyWords)])
+
+    def delete(self, section, key):
+        with self._transaction():
+            if section == 'persons':
+                self.connection.execute('DELETE FROM persons WHERE name = ?', (key,))
+            else:
+                self.connection.execute('DELETE FROM notes WHERE date = ?', (key,))
+                self.connection.execute('DELETE FROM note_keywords WHERE date = ?', (key,))
+
+    def reset(self, section):
+        with self._transaction():
+            if section == 'persons':
+                self.connection.execute('DELETE FROM persons')
+            else:
+                self.connection.execute('DELETE FROM notes')
+                self.connection.execute('DELETE FROM note_keywords')
+
+    def close(self, dict_application):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def find_keys(self, section, needle):
+        table, key = ('persons', 'name') if section == 'persons' else ('notes', 'date')
+        return [row[0] for row in self.connection.execute(
+            f'SELECT {key} FROM {table} WHERE instr(search, ?) > 0 ORDER BY rowid', (needle.lower(),))]
+
+    def keys_by_tag(self, section, tag, prefix=False):
+        if prefix:
+            # every text beginning with tag sorts between tag and tag + the last code point
+            rows = self.connection.execute(
+                'SELECT DISTINCT date FROM note_keywords WHERE keyword >= ? AND keyword < ?',
+                (tag, tag + '\U0010ffff'))
+        else:
+            rows = self.connection.execute(
+                'SELECT DISTINCT date FROM note_keywords WHERE keyword = ?', (tag,))
+        return [row[0] for row in rows]
+
+    def keys_by_birthday(self, section, start, end):
+        return self.connection.execute(
+            """SELECT birth_month, birth_day, name FROM persons
+               WHERE (birth_month, birth_day) BETWEEN (?, ?) AND (?, ?)
+               ORDER BY birth_month, birth_day, rowid""", (*start, *end)).fetchall()
+
+
+class AutosaveStorage(Storage):
+    """
+    Saving changes of the books by a background thread.
+    ________________________________________________
+
+    Books report changes as usual, but they are only remembered as dirty
+    records: a copy of the last record of every changed key, or its deletion.
+    Books change records in place, so the thread writes copies taken
+    when the change was reported, never a record changed meanwhile.
+    The thread writes them to the wrapped storage by one batch, interval
+    seconds after the first unsaved change, or at once when max_changes
+    are pending; many changes of a record are one write.
+    A batch is written when it ends, and close writes the last changes.
+    Changes which can't be written are kept and tried again.
+    """
+
+    def __init__(self, storage: Storage, interval: float = AUTOSAVE_INTERVAL, max_changes: int = AUTOSAVE_CHANGES):
+        """
+        :param storage: Storage
+            engine the changes are written to
+        :param interval: float
+            seconds a change may stay unsaved
+        :param max_changes: int
+            pending changes which are written without waiting
+        """
+        self.storage = storage
+        self.interval = interval
+        self.max_changes = max_changes
+        # section -> {key: (record or None if deleted, deleted before the record is put)}
+        self._pending = {}
+        # sections reset before their pending changes
+        self._resets = set()
+        self._count = 0
+        self._since = None
+        self._depth = 0
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._writing = threading.Lock()
+        self._thread = None
+        self._sections = None
+        # error of the last background write, reported by take_error
+        self.error = None
+
+    @property
+    def database(self):
+        return getattr(self.storage, 'database', None)
+
+    @property
+    def queries(self) -> bool:
+        return self.storage.queries
+
+    def load(self):
+        self._sections = self.storage.load()
+        return self._sections
+
+    def put(self, section, key, record):
+        record = copy.copy(record)
+        with self._condition:
+            self._note(section, key, record)
+            self._changed()
+
+    def delete(self, section, key):
+        with self._condition:
+            self._note(section, key, None)
+            self._changed()
+
+    def reset(self, section):
+        with self._condition:
+            self._reset(section)
+            self._changed()
+
+    @contextmanager
+    def batch(self):
+        with self._condition:
+            self._depth += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._depth -= 1
+                outer = not self._depth
+            if outer:
+                self.flush()
+
+    def flush(self) -> None:
+        """
+        Writing pending changes now
+        """
+        with self._writing:
+            self._flush()
+
+    def _flush(self) -> None:
+        """
+        Writing pending changes, the caller holds _writing
+        """
+        with self._condition:
+            changes, resets = self._pending, self._resets
+            self._pending, self._resets, self._count, self._since = {}, set(), 0, None
+        if not changes and not resets:
+            return
+        try:
+            with metrics.measure('storage.save'):
+                with self.storage.batch():
+                    for section in SECTIONS:
+                        if section in resets:
+                            self.storage.reset(section)
+                        for key, (record, replaced) in changes.get(section, {}).items():
+                            if record is None or replaced:
+                                self.storage.delete(section, key)
+                            if record is not None:
+                                self.storage.put(section, key, record)
+                if self._sections is not None:
+                    self.storage.save(self._sections)
+        except BaseException:
+            self._restore(changes, resets)
+            raise
+
+    def take_error(self):
+        """
+        Error of the background write since the last call, None if changes are saved
+        """
+        error, self.error = self.error, None
+        return error
+
+    def close(self, dict_application):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        finally:
+            self.storage.close(dict_application)
+
+    def find_keys(self, section, needle):
+        return self._query('find_keys', section, needle)
+
+    def keys_by_tag(self, section, tag, prefix=False):
+        return self._query('keys_by_tag', section, tag, prefix)
+
+    def keys_by_birthday(self, section, start, end):
+        return self._query('keys_by_birthday', section, start, end)
+
+    def _query(self, query: str, *args):
+        """
+        Asking the storage after writing pending changes, so it answers like the books
+        """
+        if not self.storage.queries:
+            return None
+        # the background thread doesn't write by the connection while it's queried
+        with self._writing:
+            try:
+                self._flush()
+            except OSError as error:
+                # the books have every change, they answer themselves
+                self.error = error
+                return None
+            return getattr(self.storage, query)(*args)
+
+    def _note(self, section: str, key, record) -> None:
+        changes = self._pending.setdefault(section, {})
+        replaced = False
+        if key in changes:
+            previous, replaced = changes[key]
+            if previous is None and record is not None:
+                # a deleted key put again goes to the end, like in a dict
+                del changes[key]
+                replaced = True
+        changes[key] = (record, replaced)
+
+    def _reset(self, section: str) -> None:
+        self._pending.pop(section, None)
+        self._resets.add(section)
+
+    def _changed(self) -> None:
+        self._count += 1
+        if self._since is None:
+            self._since = time.monotonic()
+        if self._thread is None and not self._stopped:
+            self._thread = threading.Thread(target=self._autosave, name='autosave', daemon=True)
+            self._thread.start()
+        # the thread waits for the first change, then for the interval or max_changes
+        self._condition.notify()
+
+    def _restore(self, changes: dict, resets: set) -> None:
+        """
+        Putting back changes which weren't written, before the ones made meanwhile
+        """
+        with self._condition:
+            newer, newer_resets = self._pending, self._resets
+            self._pending, self._resets = changes, resets
+            for section in SECTIONS:
+                if section in newer_resets:
+                    self._reset(section)
+                for key, (record, replaced) in newer.get(section, {}).items():
+                    if replaced:
+                        self._note(section, key, None)
+                    self._note(section, key, record)
+            # the next try waits for the interval
+            self._since = time.monotonic()
+
+    def _wait(self):
+        """
+        Seconds until pending changes are due, 0 if they are due now, None if there are none
+        """
+        if self._since is None or self._depth:
+            return None
+        if self._count >= self.max_changes:
+            return 0
+        return max(0.0, self._since + self.interval - time.monotonic())
+
+    def _autosave(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped and (timeout := self._wait()) != 0:
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+            try:
+                self.flush()
+            except Exception as error:
+                self.error = error
+
+
+class MappedSection(MutableMapping):
+    """
+    Records of a section of the mapped snapshot.
+    ________________________________________________
+
+    A row of the snapshot is made a record on the first access and the record
+    is kept, so every access gives the same record like a dict does.
+    A key is found by bisection of the sorted index, so checking and getting
+    one record doesn't read others. The snapshot is only read: changed,
+    added and deleted records are kept by the section.
+    Records keep the order of the snapshot, added ones follow them.
+    """
+
+    def __init__(self, section: str, snapshot, rows: int, table: int, index: int, heap: int):
+        """
+        :param section: str
+            'persons' or 'notes'
+        :param snapshot: mmap
+            mapped file of the snapshot, or its bytes
+        :param rows: int
+            number of rows of the section
+        :param table: int
+            offset of the table of rows
+        :param index: int
+            offset of numbers of rows sorted by key
+        :param heap: int
+            offset of the heap of strings
+        """
+        self.section = section
+        self.snapshot = snapshot
+        self.rows = rows
+        self.table = table
+        self.row = MAPPED_ROWS[section]
+        self.index = memoryview(snapshot)[index:index + 4 * rows].cast('I')
+        self.heap = heap
+        # key -> record of a row which was used or changed
+        self.records = {}
+        self.deleted = set()
+        # records which aren't in the snapshot, or were deleted and added again
+        self.added = {}
+
+    def __len__(self):
+        return self.rows - len(self.deleted) + len(self.added)
+
+    def __contains__(self, key):
+        if key in self.added or key in self.records:
+            return True
+        return key not in self.deleted and self._find(key) >= 0
+
+    def __getitem__(self, key):
+        record = self.added.get(key)
+        if record is None:
+            record = self.records.get(key)
+        if record is not None:
+            return record
+        row = -1 if key in self.deleted else self._find(key)
+        if row < 0:
+            raise KeyError(key)
+        record = self.records[key] = self._record(row)
+        return record
+
+    def __setitem__(self, key, record):
+        if key in self.added or key in self.deleted or (key not in self.records and self._find(key) < 0):
+            self.added[key] = record
+        else:
+            self.records[key] = record
+
+    def __delitem__(self, key):
+        if key in self.added:
+            del self.added[key]
+        elif key in self:
+            self.deleted.add(key)
+            self.records.pop(key, None)
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for row in range(self.rows):
+            key = self._key(row)
+            if key not in self.deleted:
+                yield key
+        yield from self.added
+
+    def values(self):
+        return MappedValues(self)
+
+    def items(self):
+        return MappedItems(self)
+
+    def clear(self):
+        self.rows = 0
+        self.records.clear()
+        self.deleted.clear()
+        self.added.clear()
+
+    def fields(self):
+        """
+        Fields of all records, rows which weren't used aren't made records
+        :return: generator
+            (key, fields) like record_fields gives
+        """
+        for key, fields in self._scan(self.records):
+            yield key, fields if fields is not None else record_fields(self.section, self.records[key])
+        for key, record in self.added.items():
+            yield key, record_fields(self.section, record)
+
+    def _pairs(self):
+        # records are created here, main imports this module
+        from pyCliAddressBook.main import Note, Person
+
+        kind = Person if self.section == 'persons' else Note
+        records = self.records
+        for key, fields in self._scan(records):
+            if fields is None:
+                yield key, records[key]
+                continue
+            record = records[key] = kind.__new__(kind)
+            record.__setstate__(fields)
+            yield key, record
+        yield from self.added.items()
+
+    def _scan(self, known: dict):
+        """
+        Reading rows in the order of the snapshot, deleted ones are skipped
+        :param known: dict
+            keys which fields aren't read
+        :return: generator
+            (key, fields) of rows, fields are None for known keys
+        """
+        snapshot, heap, deleted = self.snapshot, self.heap, self.deleted
+        unpack, size, table = self.row.unpack_from, self.row.size, self.table
+        persons = self.section == 'persons'
+        # equal strings share a place in the heap, so every one is decoded once
+        texts = {}
+        for row in range(self.rows):
+            values = unpack(snapshot, table + row * size)
+            key_offset, key_length = values[0], values[1]
+            key = snapshot[heap + key_offset:heap + key_offset + key_length].decode('utf-8', 'surrogatepass')
+            if key in deleted:
+                continue
+            if key in known:
+                yield key, None
+                continue
+            strings = []
+            for i in range(2, len(values) - 1, 2):
+                offset, length = values[i], values[i + 1]
+                if offset == key_offset and length == key_length:
+                    text = key
+                elif length == NO_STRING:
+                    text = None
+                else:
+                    text = texts.get(offset)
+                    if text is None:
+                        text = texts[offset] = snapshot[heap + offset:heap + offset + length].decode(
+                            'utf-8', 'surrogatepass')
+                strings.append(text)
+            if persons:
+                yield key, (*strings, values[-1])
+            else:
+                yield key, (strings[0], strings[1], strings[2].split('\0') if values[-1] else [])
+
+    def _string(self, offset: int, length: int):
+        if length == NO_STRING:
+            return None
+        start = self.heap + offset
+        return self.snapshot[start:start + length].decode('utf-8', 'surrogatepass')
+
+    def _key_bytes(self, row: int) -> bytes:
+        offset, length = MAPPED_KEY.unpack_from(self.snapshot, self.table + row * self.row.size)
+        start = self.heap + offset
+        return self.snapshot[start:start + length]
+
+    def _key(self, row: int) -> str:
+        return self._string(*MAPPED_KEY.unpack_from(self.snapshot, self.table + row * self.row.size))
+
+    def _find(self, key) -> int:
+        """
+        Number of the row of the key, -1 if there is no such row
+        """
+        if not isinstance(key, str):
+            return -1
+        target = key.encode('utf-8', 'surrogatepass')
+        low, high = 0, self.rows
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_bytes(self.index[middle]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.rows and self._key_bytes(self.index[low]) == target:
+            return self.index[low]
+        return -1
+
+    def _fields(self, row: int) -> tuple:
+        values = self.row.unpack_from(self.snapshot, self.table + row * self.row.size)
+        strings = [self._string(values[i], values[i + 1]) for i in range(2, len(values) - 1, 2)]
+        if self.section == 'persons':
+            return (*strings, values[-1])
+        date, value, keywords = strings
+        return date, value, keywords.split('\0') if values[-1] else []
+
+    def _record(self, row: int):
+        # records are created here, main imports this module
+        from pyCliAddressBook.main import Note, Person
+
+        record = (Person if self.section == 'persons' else Note).__new__(
+            Person if self.section == 'persons' else Note)
+        record.__setstate__(self._fields(row))
+        return record
+
+
+class MappedValues(ValuesView):
+
+    def __iter__(self):
+        for _, record in self._mapping._pairs():
+            yield record
+
+
+class MappedItems(ItemsView):
+
+    def __iter__(self):
+        return self._mapping._pairs()
+
+
+class LazyLoad:
+    """
+    Sections of the database, loaded by the storage on the first request.
+    Commands which don't touch records never load the database.
+    """
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        self.sections = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.sections is not None
+
+    def get(self, section: str, default=None):
+        if self.sections is None:
+            with metrics.measure('storage.load'):
+                self.sections = self.storage.load()
+        return self.sections.get(section, default)
+
+
+STORAGES = {'journal': JournalStorage,
+            'pickle': PickleStorage,
+            'sqlite': SQLiteStorage}
+
+
+def open_storage(database: str, backend: str = 'journal') -> Storage:
+    """
+    Creating storage engine by its name
+    :param database: str
+        path to the database
+    :param backend: str
+        'journal', 'pickle' or 'sqlite'
+    :return: Storage
+    """
+    if backend not in STORAGES:
+        raise ValueError(f"Unknown storage '{backend}', choose one of: {', '.join(STORAGES)}")
+    return STORAGES[backend](database)
+
+
+def read_snapshot(database: str) -> dict:
+    """
+    Reading pickled or mapped database
+    :param database: str
+        path to the file
+    :return: dict
+        all sections of the database, sections of a mapped one are MappedSection
+    """
+    dict_application = {}
+    if os.path.exists(database):
+        with open(database, 'rb') as db:
+            if db.read(len(MAPPED_MAGIC)) == MAPPED_MAGIC:
+                return read_mapped(db)
+            db.seek(0)
+            dict_application = pickle.load(db)
+            metrics.count('storage.read_bytes', db.tell())
+
+    return {section: dict_application.get(section) or {} for section in SECTIONS}
+
+
+def write_snapshot(database: str, dict_application: dict) -> None:
+    """
+    Pickling database atomically: to a temporary file which replaces the old one
+    :param database: str
+        path to the file
+    :param dict_application: dict
+        all sections of the database
+    """
+    temp_path = f'{database}.tmp'
+    with open(temp_path, 'wb') as db:
+        pickle.dump({section: dict(dict_application.get(section, {}).items()) for section in SECTIONS},
+                    db, pickle.HIGHEST_PROTOCOL)
+        metrics.count('storage.written_bytes', db.tell())
+        db.flush()
+        os.fsync(db.fileno())
+    os.replace(temp_path, database)
+
+
+def is_mapped(database: str) -> bool:
+    with open(database, 'rb') as db:
+        return db.read(len(MAPPED_MAGIC)) == MAPPED_MAGIC
+
+
+def read_mapped(db) -> dict:
+    """
+    Mapping the snapshot to memory, nothing is read until records are used
+    :param db: file
+        opened snapshot, it may be closed after mapping
+    :return: dict
+        MappedSection of every section
+    """
+    if os.name == 'nt':
+        # a mapped file can't be replaced by compaction on Windows
+        snapshot = db.read()
+        metrics.count('storage.read_bytes', len(snapshot))
+    else:
+        snapshot = mmap.mmap(db.fileno(), 0, access=mmap.ACCESS_READ)
+        # pages are read by the system when records are used
+        metrics.count('storage.mapped_bytes', len(snapshot))
+    magic, *offsets = MAPPED_HEADER.unpack_from(snapshot)
+    heap = offsets[-1]
+    return {section: MappedSection(section, snapshot, *offsets[3 * i:3 * i + 3], heap)
+            for i, section in enumerate(SECTIONS)}
+
+
+def record_fields(section: str, record) -> tuple:
+    """
+    Fields of the record kept in a row of the mapped snapshot
+    """
+    if section == 'persons':
+        return record.name, record.address, record.phone, record.email, record._birthday
+    return record.date, record.value, list(record.keyWords)
+
+
+def write_mapped(database: str, dict_application: dict) -> None:
+    """
+    Writing mapped snapshot atomically: to a temporary file which replaces the old one.
+    Rows of a MappedSection which weren't used are copied without making records.
+    :param database: str
+        path to the file
+    :param dict_application: dict
+        all sections of the database
+    """
+    heap = bytearray()
+    # equal strings are kept once
+    places = {}
+
+    def place(text) -> tuple:
+        if text is None:
+            return 0, NO_STRING
+        found = places.get(text)
+        if found is None:
+            data = text.encode('utf-8', 'surrogatepass')
+            found = places[text] = (len(heap), len(data))
+            heap.extend(data)
+        return found
+
+    tables = []
+    for section in SECTIONS:
+        records = dict_application.get(section) or {}
+        pairs = records.fields() if isinstance(records, MappedSection) else (
+            (key, record_fields(section, record)) for key, record in records.items())
+        row = MAPPED_ROWS[section]
+        rows = []
+        keys = []
+        for key, fields in pairs:
+            if section == 'persons':
+                *strings, number = fields
+            else:
+                date, value, keywords = fields
+                strings, number = (date, value, '\0'.join(keywords)), len(keywords)
+            key_place = place(key)
+            keys.append(heap[key_place[0]:key_place[0] + key_place[1]])
+            rows.append(row.pack(*key_place, *(value for text in strings for value in place(text)), number))
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        tables.append((b''.join(rows), array('I', order).tobytes()))
+
+    header = []
+    offset = MAPPED_HEADER.size
+    for table, index in tables:
+        header += [len(index) // 4, offset, offset + len(table)]
+        offset += len(table) + len(index)
+
+    temp_path = f'{database}.tmp'
+    with open(temp_path, 'wb') as db:
+        db.write(MAPPED_HEADER.pack(MAPPED_MAGIC, *header, offset))
+        for table, index in tables:
+            db.write(table)
+            db.write(index)
+        db.write(heap)
+        metrics.count('storage.written_bytes', db.tell())
+        db.flush()
+        os.fsync(db.fileno())
+    os.replace(temp_path, database)
+
+
+def replay_journal(journal: str, dict_application: dict) -> int:
+    """
+    Applying journal frames to the loaded sections
+    :param journal: str
+        path to the journal
+    :param dict_application: dict
+        sections to change
+    :return: int
+        size of the valid part of the journal
+    """
+    valid_size = 0
+    for entry, valid_size in read_frames(journal):
+        apply_entry(dict_application, entry)
+    metrics.count('storage.read_bytes', valid_size)
+    return valid_size
+
+
+def pack_frame(entry: tuple) -> bytes:
+    payload = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+    return FRAME_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_frames(journal: str):
+    """
+    Reading frames of the journal up to the first torn or damaged one
+    :param journal: str
+        path to the journal
+    :return: generator
+        (entry, size of the valid part of the journal after the entry)
+    """
+    with open(journal, 'rb') as file:
+        while True:
+            header = file.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                break
+            length, checksum = FRAME_HEADER.unpack(header)
+            payload = file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+
+            yield pickle.loads(payload), file.tell()
+
+
+def apply_entry(dict_application: dict, entry: tuple) -> None:
+    operation, section, key, record = entry
+    if operation == 'put':
+        dict_application[section][key] = record
+    elif operation == 'del':
+        dict_application[section].pop(key, None)
+    elif operation == 'reset':
+        dict_application[section] = {}
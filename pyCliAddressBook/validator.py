@@ -1,10 +1,88 @@
 """
 This module includes functions which are used to validate data inputting a user
 """
-from email.policy import default
-import phonenumbers
+from functools import lru_cache
 import re
 
+from pyCliAddressBook.metrics import metrics
+
+
+NAME_ERROR = "Please enter a valid Name"
+EMAIL_ERROR = "Invalid Email"
+PHONE_ERROR = "Invalid phone number"
+
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+# smaller batches of phones are normalized in the calling process
+PARALLEL_MIN_BATCH = 2000
+
+
+def is_valid_name(name: str) -> bool:
+    """
+    Checking that name consists of only letters
+    """
+    return isinstance(name, str) and name.isalpha()
+
+
+def is_valid_email(email: str) -> bool:
+    """
+    Checking email on pattern with module re
+    """
+    return bool(EMAIL_PATTERN.fullmatch(email))
+
+
+@lru_cache(maxsize=100000)
+def normalize_phone(phone: str, iso_code: str):
+    """
+    Formatting phone to international format with module phonenumbers
+    :param phone: str
+        phone number as it was entered
+    :param iso_code: str
+        ISO country code like UA, GB, PL etc.
+    :return: str or None
+        E.164 phone number, None if the number is invalid
+    """
+    # phonenumbers is slow to import, so it is imported by the first phone
+    import phonenumbers
+
+    try:
+        pattern = phonenumbers.parse(phone, iso_code.upper() if iso_code else None)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(pattern):
+        return None
+    return phonenumbers.format_number(pattern, phonenumbers.PhoneNumberFormat.E164)
+
+
+def normalize_phones(numbers: list, executor=None, workers: int = 1) -> list:
+    """
+    Normalizing many phones without prompts.
+    Every distinct (phone, iso_code) is parsed once; big batches are split
+    to chunks normalized by the worker processes of executor.
+    :param numbers: list
+        (phone, iso_code) tuples
+    :param executor: Executor
+        pool of worker processes, the calling process is used without it
+    :param workers: int
+        number of workers of the executor
+    :return: list
+        (E.164 phone or None, error message or None) for every number
+    """
+    unique = list(dict.fromkeys(numbers))
+    if executor is None or len(unique) < PARALLEL_MIN_BATCH:
+        normalized = [normalize_phone(*number) for number in unique]
+    else:
+        size = -(-len(unique) // (workers * 4))
+        chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+        normalized = [phone for chunk in executor.map(_normalize_chunk, chunks) for phone in chunk]
+
+    phones = dict(zip(unique, normalized))
+    return [(phones[number], None if phones[number] else PHONE_ERROR) for number in numbers]
+
+
+def _normalize_chunk(numbers: list) -> list:
+    return [normalize_phone(*number) for number in numbers]
+
 
 def name_validator():
     """
@@ -13,11 +91,11 @@ def name_validator():
         inputted name
     """
     while True:
-        name = input("Name: ")
-        if isinstance(name, str) and name.isalpha() or not name:
+        name = metrics.input("Name: ")
+        if is_valid_name(name) or not name:
             return name
         else:
-            print("Please enter a valid Name")
+            print(NAME_ERROR)
 
 
 def email_check():
@@ -27,12 +105,11 @@ def email_check():
         inputted email
     """
     while True:
-        email = input("Email: ")
-        pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        if (re.fullmatch(pattern, email)) or not email:
+        email = metrics.input("Email: ")
+        if is_valid_email(email) or not email:
             return email
         else:
-            print("Invalid Email")
+            print(EMAIL_ERROR)
 
 
 def phone_check():
@@ -42,19 +119,17 @@ def phone_check():
         formatted phone number
     """
     while True:
-        phone = input("Phone: ")
+        phone = metrics.input("Phone: ")
         if not phone:
             break
-        iso_code = input("ISO country code like UA, GB, PL etc.: ").upper()
+        iso_code = metrics.input("ISO country code like UA, GB, PL etc.: ").upper()
 
-        pattern = phonenumbers.parse(phone, iso_code)
-        if not phone or phonenumbers.is_valid_number(pattern):
-            international_number = phonenumbers.format_number(
-                pattern, phonenumbers.PhoneNumberFormat.E164)
+        international_number = normalize_phone(phone, iso_code)
+        if international_number:
             print(international_number)
             return international_number
         else:
-            print("Invalid phone number")
+            print(PHONE_ERROR)
 
 
 # (self.persons[name].__dict__.values())
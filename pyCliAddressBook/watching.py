@@ -0,0 +1,262 @@
+"""
+Watching the folder and sorting files appearing in it.
+Files are sorted by the rules of file_sort when they have been written:
+their size & modification time stay the same for some seconds.
+
+New files are noticed by inotify on Linux. Elsewhere, or when inotify
+can't watch so many folders, folders are polled: only folders which
+modification time is changed are listed again, so polling costs
+a stat call per folder, not per file.
+Folders aren't removed & renamed while they are watched.
+"""
+
+import os
+import select
+import struct
+import sys
+from time import monotonic, sleep, time_ns
+
+from pyCliAddressBook.sorting import (ARCHIVE_WORKERS, WORKERS, FreeNames, Plan, category_of,
+                                      files_extension_to_folders, perform_plan, sort_file)
+
+
+# seconds a file must stay unchanged before it is sorted
+SETTLE = 2.0
+# seconds between checks of unsettled files & polls of folders
+INTERVAL = 1.0
+
+
+class Inotify:
+    """
+    inotify of Linux called by ctypes
+    """
+
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        """
+        :raise OSError: inotify isn't available
+        """
+        import ctypes
+        import ctypes.util
+
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is available on Linux only")
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.get_errno = ctypes.get_errno
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError("inotify isn't supported by libc")
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(self.get_errno(), "inotify isn't available")
+        self.folders = {}
+
+    def add(self, folder: str) -> None:
+        """
+        :raise OSError: the folder can't be watched, ENOSPC if there are too many watches
+        """
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), self.MASK)
+        if wd < 0:
+            errno = self.get_errno()
+            raise OSError(errno, os.strerror(errno), folder)
+        self.folders[wd] = folder
+
+    def read(self, timeout: float = None) -> list:
+        """
+        Waiting for events
+        :param timeout: float
+            seconds, forever by default
+        :return: list
+            (folder, name, mask) of events, folder is None if events were lost
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        data = os.read(self.fd, 1 << 16)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & self.IN_IGNORED:
+                self.folders.pop(wd, None)
+            elif mask & self.IN_Q_OVERFLOW:
+                events.append((None, '', mask))
+            elif wd in self.folders:
+                events.append((self.folders[wd], name, mask))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class Watcher:
+    """
+    Sorting files of the folder when they are written
+    """
+
+    def __init__(self, path: str, settle: float = SETTLE, interval: float = INTERVAL,
+                 workers: int = WORKERS, archive_workers: int = ARCHIVE_WORKERS, report=print):
+        self.root = os.path.abspath(path)
+        self.settle = settle
+        self.interval = interval
+        self.workers = workers
+        self.archive_workers = archive_workers
+        self.report = report
+        # path of file -> (size, modification time) and when they were seen first, None if not checked yet
+        self.pending = {}
+        self.names = {}
+
+    def scan(self, folder: str) -> list:
+        """
+        Adding files of the folder to pending ones
+        :return: list
+            subfolders, except categorical ones
+        """
+        subfolders = []
+        try:
+            with os.scandir(folder) as iterator:
+                for entry in iterator:
+                    if entry.is_file():
+                        if category_of(entry.name):
+                            self.pending.setdefault(entry.path, None)
+                    elif entry.is_dir() and entry.name not in files_extension_to_folders:
+                        subfolders.append(entry.path)
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        return subfolders
+
+    def settled(self) -> list:
+        """
+        Pending files which haven't been changed for settle seconds
+        """
+        now = monotonic()
+        files = []
+        for path, seen in list(self.pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self.pending[path]
+                continue
+            state = (stat.st_size, stat.st_mtime_ns)
+            if seen is None or seen[0] != state:
+                self.pending[path] = (state, now)
+            elif now - seen[1] >= self.settle:
+                del self.pending[path]
+                files.append((path, stat.st_size))
+        return files
+
+    def sort(self, files: list) -> None:
+        """
+        Moving settled files to categorical folders & unpacking archives
+        """
+        if not files:
+            return
+        operations = []
+        for path, size in files:
+            folder_path, file_name = os.path.split(path)
+            folder = category_of(file_name)
+            category_path = os.path.join(folder_path, folder)
+            if category_path not in self.names:
+                self.names[category_path] = FreeNames(folder=category_path)
+            operations.append(sort_file(folder_path, file_name, folder, self.names[category_path], size))
+
+        errors = perform_plan(Plan(self.root, tuple(operations), 0), self.workers, self.archive_workers)
+        for file_path, error in errors:
+            self.report(f"Can't sort {file_path}: {error}")
+        self.report(f"{len(operations) - len(errors)} files sorted")
+
+    def watch(self) -> None:
+        """
+        Sorting files until Ctrl-C is pressed
+        """
+        try:
+            inotify = Inotify()
+        except OSError:
+            return self.poll()
+        try:
+            self.notify(inotify)
+        except OSError as error:
+            # too many folders for inotify
+            self.report(f"Can't watch by inotify: {error}, polling the folder")
+            self.poll()
+        finally:
+            inotify.close()
+
+    def watch_tree(self, inotify: Inotify, folder: str) -> None:
+        # the folder is watched before it is listed, so no new file is missed
+        inotify.add(folder)
+        for subfolder in self.scan(folder):
+            self.watch_tree(inotify, subfolder)
+
+    def notify(self, inotify: Inotify) -> None:
+        self.watch_tree(inotify, self.root)
+        while True:
+            for folder, name, mask in inotify.read(self.interval if self.pending else None):
+                if folder is None:
+                    self.watch_tree(inotify, self.root)
+                elif mask & inotify.IN_ISDIR:
+                    if name not in files_extension_to_folders:
+                        self.watch_tree(inotify, os.path.join(folder, name))
+                elif category_of(name):
+                    # every write starts the settling again
+                    self.pending[os.path.join(folder, name)] = None
+            self.sort(self.settled())
+
+    def poll(self) -> None:
+        # folder -> its modification time when it was listed
+        folders = {self.root: None}
+        recent = int(self.settle * 1e9)
+        while True:
+            for folder, listed in list(folders.items()):
+                try:
+                    changed = os.stat(folder).st_mtime_ns
+                except FileNotFoundError:
+                    del folders[folder]
+                    continue
+                # modification time is coarse, a recently changed folder is listed again
+                if changed != listed or time_ns() - changed < recent:
+                    folders[folder] = changed
+                    for subfolder in self.scan(folder):
+                        folders.setdefault(subfolder, None)
+            self.sort(self.settled())
+            sleep(self.interval)
+
+
+def watch(sorting_folder: str, settle: float = SETTLE, interval: float = INTERVAL, polling: bool = False,
+          workers: int = WORKERS, archive_workers: int = ARCHIVE_WORKERS) -> None:
+    """
+    Sorting files appearing in the folder until Ctrl-C is pressed
+    :param sorting_folder: str
+        watched folder, the current one if it's empty
+    :param settle: float
+        seconds a file must stay unchanged before it is sorted
+    :param interval: float
+        seconds between checks
+    :param polling: bool
+        polling the folder even if inotify is available
+    :param workers: int
+        threads moving files
+    :param archive_workers: int
+        archives unpacked at the same time
+    """
+    path = sorting_folder or os.getcwd()
+    if not os.path.isdir(path):
+        print("Folder isn't exist")
+        return
+
+    watcher = Watcher(path, settle, interval, workers, archive_workers)
+    print(f"Watching {watcher.root}, Ctrl-C to stop")
+    try:
+        watcher.poll() if polling else watcher.watch()
+    except KeyboardInterrupt:
+        print('watching is stopped')